@@ -1,19 +1,35 @@
 from __future__ import annotations
 
+import gc
+import hashlib
 import json
+import math
+import mmap
 import os
 import re
-from collections import defaultdict
+import struct
+import threading
+import time
+from bisect import bisect_right
+from heapq import merge
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import groupby, islice
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
 from uuid import uuid4
 
-from flask import Flask, flash, redirect, render_template, request, session, url_for
+import click
+from flask import Flask, flash, g, has_request_context, redirect, render_template, request, session, stream_with_context, url_for
+from flask.json.provider import DefaultJSONProvider
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import or_
+from sqlalchemy import and_, case, func, literal, or_, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -22,9 +38,20 @@ try:
 except Exception:
     MAPBOX_PUBLIC_TOKEN = ''
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / 'data'
 SAMPLES_DIR = DATA_DIR / 'samples'
+SAMPLE_ARTIFACT_PATH = Path(os.getenv('SAMPLE_ARTIFACT_PATH') or DATA_DIR / 'samples.bin')
 DEFAULT_PROFILE_PHOTO = '/static/img/placeholder-avatar.png'
 DEFAULT_SEED_LOCATION = {
     'label': 'New York, New York, USA',
@@ -45,7 +72,34 @@ def _database_uri() -> str:
 
 db_uri = _database_uri()
 
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson when it is installed.
+
+    Only compact output goes through orjson; pretty printing and any other
+    stdlib keyword arguments fall back to ``json``. Dates and dataclasses are
+    handed back to Flask's ``default`` so they serialize exactly as before.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or set(kwargs) - {'separators'} or kwargs.get('separators', (',', ':')) != (',', ':'):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'lineagemap-dev-secret')
 app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -94,6 +148,7 @@ class FamilyProfile(db.Model):
     profile_name = db.Column(db.String(120), nullable=False)
     profile_photo = db.Column(db.String(255), nullable=False, default=DEFAULT_PROFILE_PHOTO)
     description = db.Column(db.Text, nullable=False, default='Your family archive starts with a single root person. Add relatives, relationships, and migration stops as your story grows.')
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     user = db.relationship('User', back_populates='family_profile')
@@ -113,6 +168,10 @@ class FamilyProfile(db.Model):
 
 class Person(db.Model):
     __tablename__ = 'people'
+    __table_args__ = (
+        # Lets `public_id LIKE 'base\_%'` use an index range scan on Postgres whatever the collation.
+        db.Index('ix_people_public_id_pattern', 'public_id', postgresql_ops={'public_id': 'text_pattern_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     family_id = db.Column(db.Integer, db.ForeignKey('family_profiles.id', ondelete='CASCADE'), nullable=False, index=True)
@@ -154,14 +213,25 @@ class FamilyRelationship(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     family_id = db.Column(db.Integer, db.ForeignKey('family_profiles.id', ondelete='CASCADE'), nullable=False, index=True)
     relationship_type = db.Column(db.String(40), nullable=False, index=True)
-    person_a_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), nullable=False)
-    person_b_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), nullable=False)
+    # Indexed for the descendant walk and for set-based deletes by person.
+    person_a_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
+    person_b_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
 
     family = db.relationship('FamilyProfile', back_populates='relationships')
     person_a = db.relationship('Person', foreign_keys=[person_a_id])
     person_b = db.relationship('Person', foreign_keys=[person_b_id])
 
 
+class PersonAncestry(db.Model):
+    """Transitive closure of parent links: one row per (ancestor, descendant) pair."""
+
+    __tablename__ = 'person_ancestry'
+
+    family_id = db.Column(db.Integer, db.ForeignKey('family_profiles.id', ondelete='CASCADE'), nullable=False, index=True)
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('people.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+
 @app.before_request
 def ensure_database_ready():
     if app.config.get('_db_bootstrapped'):
@@ -170,6 +240,59 @@ def ensure_database_ready():
     app.config['_db_bootstrapped'] = True
 
 
+@app.after_request
+def cache_photo_blobs(response):
+    # Blob URLs name their content hash, so a URL never changes meaning.
+    prefix = photo_blob_url('')
+    if request.path.startswith(prefix) and '/' not in request.path[len(prefix):] and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 60 * 60
+        response.cache_control.immutable = True
+    return response
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = max(1, maxsize)
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+PAYLOAD_SCHEMA_VERSION = 1
+SAMPLE_MAX_AGE = 24 * 60 * 60
+payload_cache = LRUCache(int(os.getenv('PAYLOAD_CACHE_SIZE', '256')))
+STREAM_PEOPLE_THRESHOLD = int(os.getenv('STREAM_PEOPLE_THRESHOLD', '5000'))
+# Latest laid-out rows per family, used to relayout incrementally after an edit.
+layout_rows_cache = LRUCache(int(os.getenv('LAYOUT_ROWS_CACHE_SIZE', '64')))
+layout_index_cache = LRUCache(int(os.getenv('LAYOUT_INDEX_CACHE_SIZE', '64')))
+kinship_index_cache = LRUCache(int(os.getenv('KINSHIP_INDEX_CACHE_SIZE', '32')))
+# Shared photo blobs each family revision (or sample file) points at.
+family_blobs_cache = LRUCache(int(os.getenv('FAMILY_BLOBS_CACHE_SIZE', '256')))
+KINSHIP_MAX_PAIRS = int(os.getenv('KINSHIP_MAX_PAIRS', '2500'))
+
+
 def load_json(path: Path, default=None):
     if not path.exists():
         return {} if default is None else default
@@ -182,18 +305,102 @@ def slugify(value: str) -> str:
     return cleaned.strip('_') or f'person_{uuid4().hex[:6]}'
 
 
+class SampleFamilyRegistry:
+    """Process-wide cache of the read-only sample families in ``data/samples``.
+
+    Each file is parsed once and re-read only when its mtime or size changes.
+    Payloads are shared between requests, so callers must not mutate them.
+    """
+
+    REQUIRED_KEYS = ('people', 'relationships', 'events')
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self._dir_stamp: tuple[int, int] | None = None
+        self._paths: dict[str, Path] = {}
+        self._entries: dict[str, tuple[tuple[int, int], dict]] = {}
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int] | None:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _refresh(self) -> None:
+        stamp = self._stamp(self.root)
+        if stamp is None:
+            self._dir_stamp = None
+            self._paths = {}
+            self._entries = {}
+            return
+        if stamp != self._dir_stamp:
+            self._paths = {path.stem: path for path in sorted(self.root.glob('*.json'))}
+            self._entries = {sid: entry for sid, entry in self._entries.items() if sid in self._paths}
+            self._dir_stamp = stamp
+        for sid, path in self._paths.items():
+            file_stamp = self._stamp(path)
+            entry = self._entries.get(sid)
+            if entry is not None and entry[0] == file_stamp:
+                continue
+            try:
+                payload = load_json(path, default={})
+            except ValueError:
+                app.logger.warning('Skipping unreadable sample family %s', path)
+                payload = {}
+            self._entries[sid] = (file_stamp, payload)
+
+    def reload(self) -> None:
+        with self._lock:
+            self._dir_stamp = None
+            self._entries = {}
+            self._refresh()
+
+    def ids(self) -> list[str]:
+        with self._lock:
+            self._refresh()
+            return [
+                sid for sid, (_, payload) in self._entries.items()
+                if isinstance(payload, dict) and all(key in payload for key in self.REQUIRED_KEYS)
+            ]
+
+    def payload(self, sample_id: str) -> dict:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(sample_id)
+        payload = entry[1] if entry else {}
+        return payload if isinstance(payload, dict) else {}
+
+    def stamp(self, sample_id: str) -> tuple[int, int] | None:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(sample_id)
+        return entry[0] if entry else None
+
+    def label(self, sample_id: str) -> str:
+        return self.payload(sample_id).get('meta', {}).get('family_name') or sample_id.replace('_', ' ').title()
+
+
+sample_registry = SampleFamilyRegistry(SAMPLES_DIR)
+
+
+def reload_sample_families() -> None:
+    sample_registry.reload()
+
+
 def sample_family_ids() -> list[str]:
-    ids: list[str] = []
-    if not SAMPLES_DIR.exists():
-        return ids
-    for path in sorted(SAMPLES_DIR.glob('*.json')):
-        payload = load_json(path, default={})
-        if isinstance(payload, dict) and all(key in payload for key in ('people', 'relationships', 'events')):
-            ids.append(path.stem)
-    return ids
+    return sample_registry.ids()
 
 
 def selected_family_id() -> str:
+    if 'selected_family_id' not in g:
+        g.selected_family_id = _resolve_selected_family_id()
+    return g.selected_family_id
+
+
+def _resolve_selected_family_id() -> str:
     requested = (request.args.get('family') or '').strip().lower()
     options = sample_family_ids()
     fallback = 'johnson' if 'johnson' in options else (options[0] if options else 'kennedy')
@@ -208,13 +415,115 @@ def selected_family_id() -> str:
 
 
 def sample_family_label(sample_id: str) -> str:
-    payload = load_json(SAMPLES_DIR / f'{sample_id}.json', default={})
-    return payload.get('meta', {}).get('family_name') or sample_id.replace('_', ' ').title()
+    return sample_registry.label(sample_id)
+
+
+class SampleArtifact:
+    """Prebuilt response bodies for the sample families, memory-mapped from one file.
+
+    Layout: ``MAGIC``, a little-endian u32 header length, a JSON header, then
+    the bodies back to back. The header records, per sample, the sha1 of
+    its source file, its photo-variant stamp and ``repr(view_key) ->
+    [offset, length]`` with offsets counted from the end of the header. A body is only served while the sample file still
+    hashes the same (checked once per file stamp) and its variants are
+    unchanged; anything else falls back to building the payload live.
+    Built by ``flask build-sample-artifact``.
+    """
+
+    MAGIC = b'LAMSAMP1'
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_stamp: tuple | None = None
+        self._data: mmap.mmap | None = None
+        self._base = 0
+        self._samples: dict[str, dict] = {}
+        self._verified: dict[str, tuple[int, int] | None] = {}
+
+    def _refresh(self) -> None:
+        try:
+            stat = self.path.stat()
+            file_stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            file_stamp = None
+        if file_stamp == self._file_stamp:
+            return
+        self._file_stamp = file_stamp
+        self._data, self._samples, self._verified = None, {}, {}
+        if file_stamp is None:
+            return
+        try:
+            with self.path.open('rb') as handle:
+                data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if data[:len(self.MAGIC)] != self.MAGIC:
+                raise ValueError('bad magic')
+            start = len(self.MAGIC) + 4
+            (size,) = struct.unpack_from('<I', data, len(self.MAGIC))
+            header = json.loads(data[start:start + size])
+        except (OSError, ValueError, struct.error):
+            app.logger.warning('Ignoring unreadable sample artifact %s', self.path)
+            return
+        if header.get('schema') == PAYLOAD_SCHEMA_VERSION:
+            self._data, self._base, self._samples = data, start + size, header.get('samples') or {}
+
+    def _current(self, sample_id: str, stamp: tuple[int, int] | None, variants: tuple | None) -> dict | None:
+        sample = self._samples.get(sample_id)
+        if sample is None or stamp is None or sample['variants'] != repr(variants):
+            return None
+        if self._verified.get(sample_id) != stamp:
+            try:
+                digest = hashlib.sha1((SAMPLES_DIR / f'{sample_id}.json').read_bytes()).hexdigest()
+            except OSError:
+                return None
+            if digest != sample['sha1']:
+                return None
+            self._verified[sample_id] = stamp
+        return sample
+
+    def body(self, source: tuple, view_key: tuple) -> bytes | None:
+        """Body for ``view_key`` of the sample named by a ``('sample', id, stamp, variants)`` cache key."""
+        _, sample_id, stamp, variants = source
+        with self._lock:
+            self._refresh()
+            sample = self._current(sample_id, stamp, variants)
+            data, base = self._data, self._base
+        span = sample['views'].get(repr(view_key)) if sample else None
+        if span is None:
+            return None
+        offset, length = span
+        return data[base + offset:base + offset + length]
+
+    @classmethod
+    def write(cls, path: Path, samples: dict[str, dict], bodies: dict[str, dict[tuple, bytes]]) -> int:
+        """Write ``bodies[sample_id][view_key]`` plus per-sample ``samples`` metadata; returns the file size."""
+        header = {'schema': PAYLOAD_SCHEMA_VERSION, 'samples': {}}
+        chunks: list[bytes] = []
+        position = 0
+        for sample_id, views in bodies.items():
+            spans = {}
+            for view_key, body in views.items():
+                spans[repr(view_key)] = [position, len(body)]
+                chunks.append(body)
+                position += len(body)
+            header['samples'][sample_id] = {**samples[sample_id], 'views': spans}
+        encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with tmp_path.open('wb') as handle:
+            handle.write(cls.MAGIC)
+            handle.write(struct.pack('<I', len(encoded)))
+            handle.write(encoded)
+            handle.writelines(chunks)
+        tmp_path.replace(path)
+        return path.stat().st_size
+
+
+sample_artifact = SampleArtifact(SAMPLE_ARTIFACT_PATH)
 
 
 def load_sample_family(sample_id: str | None = None) -> dict:
     sid = sample_id or selected_family_id()
-    return load_json(SAMPLES_DIR / f'{sid}.json', default={})
+    return sample_registry.payload(sid)
 
 
 def _num(value, default=0.0):
@@ -224,39 +533,334 @@ def _num(value, default=0.0):
         return float(default)
 
 
-def _normalize_photo_path(raw: str | None, family_id: str | None = None) -> str:
-    value = str(raw or '').strip()
+class UploadManifest:
+    """Process-wide listing of the files in each ``static/uploads/<family>`` folder.
+
+    A folder is listed once and re-listed only when its mtime changes. The
+    mtime itself is checked at most once every ``ttl`` seconds, so lookups
+    normally cost a set membership test instead of a filesystem stat.
+    Uploads handled by this process are recorded directly via ``add``.
+    """
+
+    def __init__(self, root: Path, ttl: float = 2.0):
+        self.root = root
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[int | None, float, frozenset[str]]] = {}
+
+    def _refresh(self, family_id: str, entry, now: float) -> tuple[int | None, float, frozenset[str]]:
+        folder = self.root / family_id
+        try:
+            mtime = folder.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if entry is not None and entry[0] == mtime:
+            names = entry[2]
+        elif mtime is None:
+            names = frozenset()
+        else:
+            try:
+                names = frozenset(os.listdir(folder))
+            except OSError:
+                names = frozenset()
+        return (mtime, now, names)
+
+    def names(self, family_id: str) -> frozenset[str]:
+        now = time.monotonic()
+        entry = self._entries.get(family_id)
+        if entry is None or now - entry[1] >= self.ttl:
+            with self._lock:
+                entry = self._entries.get(family_id)
+                if entry is None or now - entry[1] >= self.ttl:
+                    entry = self._refresh(family_id, entry, now)
+                    self._entries[family_id] = entry
+        return entry[2]
+
+    def stamp(self, family_id: str) -> tuple[int | None, int]:
+        names = self.names(family_id)
+        return (self._entries[family_id][0], len(names))
+
+    def __contains__(self, item: tuple[str, str]) -> bool:
+        family_id, name = item
+        return bool(name) and name in self.names(family_id)
+
+    def add(self, family_id: str, name: str) -> None:
+        # Keep the cached mtime so the next revalidation still picks up files
+        # written concurrently by other workers.
+        with self._lock:
+            mtime, checked, names = self._entries.get(family_id) or (None, time.monotonic(), frozenset())
+            self._entries[family_id] = (mtime, checked, names | {name})
+
+    def discard(self, family_id: str, name: str) -> None:
+        with self._lock:
+            entry = self._entries.get(family_id)
+            if entry is not None:
+                self._entries[family_id] = (entry[0], entry[1], entry[2] - {name})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+upload_manifest = UploadManifest(UPLOAD_ROOT, float(os.getenv('UPLOAD_MANIFEST_TTL', '2')))
+
+
+@lru_cache(maxsize=65536)
+def _photo_path_rule(value: str) -> tuple[str | None, str]:
+    """Family-independent part of ``_normalize_photo_path``.
+
+    Returns ``(path, '')`` when ``value`` normalizes on its own, or
+    ``(None, basename)`` when it resolves only if the family uploaded that file.
+    """
     if not value:
-        return DEFAULT_PROFILE_PHOTO
+        return DEFAULT_PROFILE_PHOTO, ''
     if value.endswith('/you.jpg'):
-        return DEFAULT_PROFILE_PHOTO
+        return DEFAULT_PROFILE_PHOTO, ''
     if value.startswith('/static/uploads/'):
-        return value
+        return value, ''
     if value.startswith('static/uploads/'):
-        return '/' + value.lstrip('/')
+        return '/' + value.lstrip('/'), ''
     if value.startswith('/static/img/placeholder-avatar.png'):
-        return value
+        return value, ''
     if value.startswith('static/img/placeholder-avatar.png'):
-        return '/' + value.lstrip('/')
+        return '/' + value.lstrip('/'), ''
     if value.startswith('/static/img/'):
-        basename = Path(value).name
-        if family_id:
-            candidate = BASE_DIR / 'static' / 'uploads' / family_id / basename
-            if candidate.exists():
-                return f'/static/uploads/{family_id}/{basename}'
-        return DEFAULT_PROFILE_PHOTO
+        return None, Path(value).name
     if value.startswith('/uploads/'):
-        return '/static' + value
+        return '/static' + value, ''
     if value.startswith('uploads/'):
-        return '/static/' + value
-    basename = Path(value).name
-    if family_id:
-        candidate = BASE_DIR / 'static' / 'uploads' / family_id / basename
-        if candidate.exists():
-            return f'/static/uploads/{family_id}/{basename}'
+        return '/static/' + value, ''
+    return None, Path(value).name
+
+
+def _normalize_photo_path(raw: str | None, family_id: str | None = None) -> str:
+    path, basename = _photo_path_rule(str(raw or '').strip())
+    if path is not None:
+        return path
+    if family_id and (family_id, basename) in upload_manifest:
+        return f'/static/uploads/{family_id}/{basename}'
     return DEFAULT_PROFILE_PHOTO
 
 
+PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+# Longest edge in pixels of each WebP variant generated for an uploaded photo.
+PHOTO_VARIANTS = {'card': 256, 'avatar': 96, 'full': 1600}
+PHOTO_VARIANT_DIR = 'variants'
+
+
+def photo_variant_name(filename: str, variant: str) -> str:
+    return f'{filename}.{variant}.webp'
+
+
+def photo_variants_stamp(family_id: str | None, blobs: frozenset[str] = frozenset()) -> tuple | None:
+    """Changes whenever a variant URL in this family's payloads could.
+
+    Covers the family's own upload folder and, of the shared blobs, only the
+    ones in ``blobs``; uploads by other families leave it alone.
+    """
+    if not family_id:
+        return None
+    folder = f'{PHOTO_BLOB_DIR}/{PHOTO_VARIANT_DIR}'
+    present = [name for name in (photo_variant_name(blob, variant) for blob in sorted(blobs) for variant in PHOTO_VARIANTS) if (folder, name) in upload_manifest]
+    return (
+        upload_manifest.stamp(f'{family_id}/{PHOTO_VARIANT_DIR}'),
+        hashlib.sha1('\n'.join(present).encode('utf-8')).hexdigest() if present else None,
+    )
+
+
+def photo_variant_url(path: str, variant: str) -> str:
+    """URL of ``variant`` for an uploaded photo, or ``path`` itself until that variant exists."""
+    if not path.startswith('/static/uploads/'):
+        return path
+    folder, _, filename = path[len('/static/uploads/'):].rpartition('/')
+    if not folder or '..' in folder or folder.endswith(f'/{PHOTO_VARIANT_DIR}'):
+        return path
+    name = photo_variant_name(filename, variant)
+    if (f'{folder}/{PHOTO_VARIANT_DIR}', name) in upload_manifest:
+        return f'/static/uploads/{folder}/{PHOTO_VARIANT_DIR}/{name}'
+    return path
+
+
+def render_photo_variants(source: str, target_dir: str) -> list[str]:
+    """Write every PHOTO_VARIANTS size of ``source`` into ``target_dir``; runs in a pool worker."""
+    source_path = Path(source)
+    target = Path(target_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    written = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+        for variant, edge in PHOTO_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            name = photo_variant_name(source_path.name, variant)
+            partial_path = target / f'.{name}.{os.getpid()}.tmp'
+            resized.save(partial_path, 'WEBP', quality=80, method=4)
+            os.replace(partial_path, target / name)
+            written.append(name)
+    return written
+
+
+class PhotoVariantQueue:
+    """Builds photo variants in a process pool so uploads return immediately.
+
+    Finished variants are recorded in ``upload_manifest``; until then
+    ``photo_variant_url`` keeps serving the original. Without Pillow this is
+    a no-op.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._pid: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # A pool inherited through fork (gunicorn --preload) has no live workers.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, family_id: str, filename: str) -> bool:
+        if not self.enabled:
+            return False
+        folder = UPLOAD_ROOT / family_id
+        with self._lock:
+            future = self._pool().submit(render_photo_variants, str(folder / filename), str(folder / PHOTO_VARIANT_DIR))
+        future.add_done_callback(partial(self._finished, family_id, filename))
+        return True
+
+    @staticmethod
+    def _finished(family_id: str, filename: str, future) -> None:
+        try:
+            names = future.result()
+        except Exception:
+            app.logger.warning('Could not build photo variants for %s/%s', family_id, filename, exc_info=True)
+            return
+        for name in names:
+            upload_manifest.add(f'{family_id}/{PHOTO_VARIANT_DIR}', name)
+
+
+photo_variant_queue = PhotoVariantQueue(int(os.getenv('PHOTO_VARIANT_WORKERS', '2')))
+
+# Uploads are stored once under their SHA-256, shared by every family.
+PHOTO_BLOB_DIR = '_blobs'
+PHOTO_BLOB_CHUNK_SIZE = 64 * 1024
+# Unreferenced blobs younger than this are kept: a fresh upload is not attached to anyone until the form is saved.
+PHOTO_BLOB_GRACE_SECONDS = int(os.getenv('PHOTO_BLOB_GRACE_SECONDS', '3600'))
+PHOTO_BLOB_EXTENSIONS = {'.jpeg': '.jpg'}
+
+
+def photo_blob_url(name: str) -> str:
+    return f'/static/uploads/{PHOTO_BLOB_DIR}/{name}'
+
+
+def store_photo_blob(stream, ext: str) -> tuple[str, bool]:
+    """Stream ``stream`` to disk in chunks while hashing it.
+
+    Returns the blob's file name and whether it was new; identical content
+    is stored once no matter which family uploads it.
+    """
+    folder = UPLOAD_ROOT / PHOTO_BLOB_DIR
+    folder.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    partial_path = folder / f'.upload-{uuid4().hex}.tmp'
+    try:
+        with partial_path.open('wb') as out:
+            for chunk in iter(lambda: stream.read(PHOTO_BLOB_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        name = f'{digest.hexdigest()}{PHOTO_BLOB_EXTENSIONS.get(ext, ext)}'
+        target = folder / name
+        if target.exists():
+            # Restart the grace period so a concurrent sweep keeps it.
+            os.utime(target)
+            return name, False
+        os.replace(partial_path, target)
+        return name, True
+    finally:
+        partial_path.unlink(missing_ok=True)
+
+
+def photo_blob_names(urls) -> frozenset[str]:
+    prefix = photo_blob_url('')
+    paths = (_normalize_photo_path(url) for url in urls if url)
+    return frozenset(path[len(prefix):] for path in paths if path.startswith(prefix) and '/' not in path[len(prefix):])
+
+
+def family_photo_blobs(family: FamilyProfile) -> frozenset[str]:
+    """Blobs a user family's people and profile use, looked up once per revision."""
+    key = ('family', family.id, family.revision)
+    blobs = family_blobs_cache.get(key)
+    if blobs is None:
+        photos = db.session.scalars(
+            db.select(Person.photo).where(Person.family_id == family.id, Person.photo.startswith(photo_blob_url(''))).distinct()
+        ).all()
+        blobs = photo_blob_names([*photos, family.profile_photo])
+        family_blobs_cache.set(key, blobs)
+    return blobs
+
+
+def sample_photo_blobs(sample_id: str, stamp: tuple[int, int] | None) -> frozenset[str]:
+    key = ('sample', sample_id, stamp)
+    blobs = family_blobs_cache.get(key)
+    if blobs is None:
+        payload = sample_registry.payload(sample_id)
+        people = payload.get('people') or []
+        urls = [person.get('photo') or person.get('image') for person in people if isinstance(person, dict)]
+        blobs = photo_blob_names([*urls, (payload.get('meta') or {}).get('profile_photo')])
+        family_blobs_cache.set(key, blobs)
+    return blobs
+
+
+def photo_blob_refcounts(urls) -> Counter:
+    """How many people and family profiles point at each of the given blob URLs."""
+    urls = list(urls)
+    counts: Counter = Counter()
+    for offset in range(0, len(urls), 500):
+        batch = urls[offset:offset + 500]
+        for column in (Person.photo, FamilyProfile.profile_photo):
+            counts.update(dict(db.session.execute(
+                db.select(column, func.count()).where(column.in_(batch)).group_by(column)
+            ).all()))
+    return counts
+
+
+def collect_photo_blobs(urls) -> list[str]:
+    """Delete the blobs among ``urls`` that nothing references any more, with their variants."""
+    prefix = photo_blob_url('')
+    candidates = {url for url in urls if url and url.startswith(prefix) and '/' not in url[len(prefix):]}
+    if not candidates:
+        return []
+    counts = photo_blob_refcounts(candidates)
+    folder = UPLOAD_ROOT / PHOTO_BLOB_DIR
+    cutoff = time.time() - PHOTO_BLOB_GRACE_SECONDS
+    removed = []
+    for url in sorted(candidates):
+        if counts[url]:
+            continue
+        name = url[len(prefix):]
+        path = folder / name
+        try:
+            if path.stat().st_mtime > cutoff:
+                continue
+            path.unlink()
+        except OSError:
+            continue
+        for variant in PHOTO_VARIANTS:
+            variant_name = photo_variant_name(name, variant)
+            (folder / PHOTO_VARIANT_DIR / variant_name).unlink(missing_ok=True)
+            upload_manifest.discard(f'{PHOTO_BLOB_DIR}/{PHOTO_VARIANT_DIR}', variant_name)
+        removed.append(name)
+    return removed
+
+
 def format_place(location: dict | None) -> str:
     if not isinstance(location, dict):
         return ''
@@ -286,18 +890,29 @@ def current_user() -> User | None:
     username = session.get('username')
     if not username:
         return None
-    return User.query.filter_by(username=username).first()
+    return get_user(username)
 
 
 def get_user(username: str) -> User | None:
-    return User.query.filter_by(username=username).first()
+    """User by username, looked up at most once per request.
+
+    The context processor, the view and the family helpers all ask for the
+    same user; misses are not remembered so a user created mid-request is
+    still found.
+    """
+    users = g.setdefault('users', {})
+    user = users.get(username)
+    if user is None:
+        user = users[username] = User.query.filter_by(username=username).first()
+        if user is None:
+            del users[username]
+    return user
 
 
 def _build_seed_person(user: User, family: FamilyProfile) -> Person:
-    root_public_id = slugify(f'{user.username}_root')
     person = Person(
         family=family,
-        public_id=root_public_id,
+        public_id=unique_person_public_id(f'{user.username}_root'),
         name=family.profile_name,
         born='',
         died='',
@@ -317,15 +932,12 @@ def _build_seed_person(user: User, family: FamilyProfile) -> Person:
     return person
 
 
-def ensure_user_family(username: str) -> dict:
-    user = get_user(username)
-    if not user:
-        return {}
+def _seed_user_family(user: User) -> None:
     family = user.family_profile
     if family is None:
         family = FamilyProfile(
             user=user,
-            family_slug=username,
+            family_slug=user.username,
             family_name=f'{user.display_name} Family',
             profile_name=user.display_name,
             profile_photo=DEFAULT_PROFILE_PHOTO,
@@ -336,30 +948,199 @@ def ensure_user_family(username: str) -> dict:
         db.session.commit()
     elif not family.people:
         db.session.add(_build_seed_person(user, family))
+        bump_family_revision(family)
         db.session.commit()
-    return family_to_payload(family)
 
 
+def _ensure_seeded(user: User) -> FamilyProfile | None:
+    family = user.family_profile
+    # An id probe rather than family.people, which would load the whole tree on every request.
+    if family is None or db.session.query(Person.id).filter_by(family_id=family.id).first() is None:
+        retry_on_conflict(partial(_seed_user_family, user))
+        family = user.family_profile
+    return family
+
+
+
+PUBLIC_ID_INDEX = 'ix_people_public_id'
+PUBLIC_ID_CONFLICT_RETRIES = 3
+
+
+def _public_id_filter(bases: list[str]):
+    # Exact ids plus their `_N` siblings; the LIKE is served by the pattern index on Postgres.
+    patterns = [base.replace('_', '\\_').replace('%', '\\%') + '\\_%' for base in bases]
+    return or_(Person.public_id.in_(bases), *(Person.public_id.like(pattern, escape='\\') for pattern in patterns))
+
+
+def _next_public_id(base: str, taken: set[str], counter: int = 2) -> tuple[str, int]:
+    person_id = base
+    while person_id in taken:
+        person_id = f'{base}_{counter}'
+        counter += 1
+    return person_id, counter
+
 
 def unique_person_public_id(base_text: str) -> str:
+    """First free id among ``base``, ``base_2``, ``base_3`` ... found with one query.
+
+    The result can still lose a race to another worker; callers insert it
+    under retry_on_conflict so a unique violation just allocates again.
+    """
     base_id = slugify(base_text) or 'person'
-    person_id = base_id
-    counter = 2
-    while db.session.query(Person.id).filter_by(public_id=person_id).first() is not None:
-        person_id = f'{base_id}_{counter}'
-        counter += 1
-    return person_id
+    taken = set(db.session.scalars(db.select(Person.public_id).where(_public_id_filter([base_id]))))
+    return _next_public_id(base_id, taken)[0]
+
+
+def unique_person_public_ids(base_texts: list[str]) -> list[str]:
+    """Bulk unique_person_public_id: ids unique against the table and each other.
+
+    One exact-match query per 500 distinct bases; the prefix query for
+    suffixed siblings only runs, 200 bases at a time, for bases that are
+    already taken or repeat within the batch.
+    """
+    bases = [slugify(text) or 'person' for text in base_texts]
+    counts = Counter(bases)
+    distinct = list(counts)
+    taken: set[str] = set()
+    for offset in range(0, len(distinct), 500):
+        taken.update(db.session.scalars(db.select(Person.public_id).where(Person.public_id.in_(distinct[offset:offset + 500]))))
+    colliding = [base for base in distinct if base in taken or counts[base] > 1]
+    for offset in range(0, len(colliding), 200):
+        taken.update(db.session.scalars(db.select(Person.public_id).where(_public_id_filter(colliding[offset:offset + 200]))))
+
+    next_counter: dict[str, int] = {}
+    public_ids = []
+    for base in bases:
+        person_id, next_counter[base] = _next_public_id(base, taken, next_counter.get(base, 2))
+        taken.add(person_id)
+        public_ids.append(person_id)
+    return public_ids
+
+
+def is_public_id_conflict(exc: IntegrityError) -> bool:
+    """Whether ``exc`` is a duplicate ``people.public_id`` rather than some other constraint."""
+    diag = getattr(exc.orig, 'diag', None)
+    if getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == PUBLIC_ID_INDEX
+    # SQLite only says it in the message: "UNIQUE constraint failed: people.public_id".
+    message = str(exc.orig)
+    return 'UNIQUE' in message.upper() and ('people.public_id' in message or PUBLIC_ID_INDEX in message)
+
+
+def retry_on_conflict(operation, attempts: int = PUBLIC_ID_CONFLICT_RETRIES):
+    """Run ``operation()``, which allocates public ids and commits, again after a public id clash.
+
+    A concurrent worker can claim the same free id between our lookup and
+    our insert; rolling back and running the whole operation again picks
+    the next free one. Any other integrity error is raised straight away.
+    """
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except IntegrityError as exc:
+            db.session.rollback()
+            if attempt == attempts - 1 or not is_public_id_conflict(exc):
+                raise
+            app.logger.info('Public id conflict, retrying (%s/%s)', attempt + 1, attempts)
+
+
+def bump_family_revision(family: FamilyProfile) -> None:
+    # Evaluated in SQL so concurrent writers in other workers cannot lose an increment.
+    family.revision = FamilyProfile.revision + 1
+
+
+def is_ancestor(ancestor_pk: int, descendant_pk: int) -> bool:
+    return db.session.get(PersonAncestry, (ancestor_pk, descendant_pk)) is not None
+
+
+def ancestor_ids(person_pk: int) -> set[int]:
+    return set(db.session.scalars(db.select(PersonAncestry.ancestor_id).where(PersonAncestry.descendant_id == person_pk)))
+
+
+def descendant_ids(person_pk: int) -> set[int]:
+    return set(db.session.scalars(db.select(PersonAncestry.descendant_id).where(PersonAncestry.ancestor_id == person_pk)))
+
+
+def ensure_family_ancestry(family_pk: int) -> None:
+    """Build the ancestry index of a family whose parent links pre-date it; checked once per request."""
+    checked = g.setdefault('ancestry_checked', set())
+    if family_pk in checked:
+        return
+    checked.add(family_pk)
+    indexed = db.session.query(PersonAncestry.ancestor_id).filter_by(family_id=family_pk).first()
+    if indexed is None and db.session.query(FamilyRelationship.id).filter_by(family_id=family_pk, relationship_type='parent').first():
+        app.logger.info('Building the missing ancestry index of family %s', family_pk)
+        rebuild_family_ancestry(family_pk)
+
+
+def creates_ancestry_cycle(family_pk: int, parent_pk: int, child_pk: int) -> bool:
+    ensure_family_ancestry(family_pk)
+    return parent_pk == child_pk or is_ancestor(child_pk, parent_pk)
+
+
+def index_parent_link(family_pk: int, parent_pk: int, child_pk: int) -> None:
+    """Add the pairs a new parent -> child link creates to the ancestry index.
+
+    Every ancestor of the parent (and the parent) becomes an ancestor of the
+    child and every descendant of the child, in one INSERT ... SELECT.
+    Callers check creates_ancestry_cycle first.
+    """
+    above = db.union(
+        db.select(literal(parent_pk).label('id')),
+        db.select(PersonAncestry.ancestor_id).where(PersonAncestry.descendant_id == parent_pk),
+    ).subquery()
+    below = db.union(
+        db.select(literal(child_pk).label('id')),
+        db.select(PersonAncestry.descendant_id).where(PersonAncestry.ancestor_id == child_pk),
+    ).subquery()
+    known = db.select(PersonAncestry.ancestor_id).where(
+        PersonAncestry.ancestor_id == above.c.id, PersonAncestry.descendant_id == below.c.id
+    )
+    db.session.execute(
+        db.insert(PersonAncestry).from_select(
+            ['family_id', 'ancestor_id', 'descendant_id'],
+            db.select(literal(family_pk), above.c.id, below.c.id)
+            .select_from(above.join(below, true()))
+            .where(~known.exists()),
+        )
+    )
+
+
+def rebuild_family_ancestry(family_pk: int) -> int:
+    """Recompute a family's ancestry index from its parent links; returns the pair count.
+
+    Used after bulk imports and by ``flask rebuild-ancestry``. Imported data
+    can contain cycles; UNION keeps the walk finite and people on a cycle
+    end up as their own ancestor.
+    """
+    PersonAncestry.query.filter_by(family_id=family_pk).delete(synchronize_session=False)
+    is_parent_link = and_(FamilyRelationship.family_id == family_pk, FamilyRelationship.relationship_type == 'parent')
+    closure = db.select(
+        FamilyRelationship.person_a_id.label('ancestor_id'), FamilyRelationship.person_b_id.label('descendant_id')
+    ).where(is_parent_link).cte('closure', recursive=True)
+    closure = closure.union(
+        db.select(closure.c.ancestor_id, FamilyRelationship.person_b_id)
+        .join(FamilyRelationship, FamilyRelationship.person_a_id == closure.c.descendant_id)
+        .where(is_parent_link)
+    )
+    db.session.execute(
+        db.insert(PersonAncestry).from_select(
+            ['family_id', 'ancestor_id', 'descendant_id'],
+            db.select(literal(family_pk), closure.c.ancestor_id, closure.c.descendant_id),
+        )
+    )
+    return db.session.scalar(db.select(func.count()).select_from(PersonAncestry).where(PersonAncestry.family_id == family_pk))
 
 
 def family_profile_for_user(username: str) -> FamilyProfile | None:
-    user = get_user(username)
-    if not user:
-        return None
-    if user.family_profile is None or not user.family_profile.people:
-        ensure_user_family(username)
-        db.session.expire_all()
+    """The user's family profile, seeded if empty; resolved once per request."""
+    families = g.setdefault('family_profiles', {})
+    if username not in families:
         user = get_user(username)
-    return user.family_profile if user else None
+        if not user:
+            return None
+        families[username] = _ensure_seeded(user)
+    return families[username]
 
 
 def person_location_payload(person: Person) -> dict:
@@ -432,56 +1213,130 @@ def apply_person_migrations(person: Person, raw_value) -> None:
         person.current_location_lng = None
 
 
-def family_to_payload(family: FamilyProfile | None) -> dict:
-    if family is None:
-        return {'meta': {}, 'people': [], 'relationships': [], 'events': []}
+def _person_columns() -> tuple:
+    return (
+        Person.id,
+        Person.public_id,
+        Person.name,
+        Person.born,
+        Person.died,
+        Person.photo,
+        Person.current_location_label,
+        Person.current_location_lat,
+        Person.current_location_lng,
+    )
 
-    people_payload = []
-    for person in family.people:
-        migrations = []
-        for migration in person.migrations:
-            entry = {'label': migration.label}
-            if migration.lat is not None:
-                entry['lat'] = migration.lat
-            if migration.lng is not None:
-                entry['lng'] = migration.lng
-            migrations.append(entry)
-        current_location = person_location_payload(person)
-        if current_location and not migrations:
-            migrations.append(dict(current_location))
-        people_payload.append({
-            'id': person.public_id,
-            'name': person.name,
-            'born': person.born,
-            'died': person.died,
-            'photo': _normalize_photo_path(person.photo, family.family_slug),
-            'current_location': current_location,
-            'migrations': migrations,
-        })
 
+def _migration_rows_by_person(condition) -> dict[int, list]:
+    migrations_by_person: dict[int, list] = defaultdict(list)
+    migration_rows = db.session.execute(
+        db.select(PersonMigration.person_id, PersonMigration.label, PersonMigration.lat, PersonMigration.lng)
+        .join(Person, Person.id == PersonMigration.person_id)
+        .where(condition)
+        .order_by(PersonMigration.person_id, PersonMigration.position, PersonMigration.id)
+    )
+    for row in migration_rows:
+        migrations_by_person[row.person_id].append(row)
+    return migrations_by_person
+
+
+def _relationship_rows(family: FamilyProfile):
+    person_a = aliased(Person)
+    person_b = aliased(Person)
+    return db.session.execute(
+        db.select(
+            FamilyRelationship.relationship_type,
+            person_a.public_id.label('a'),
+            person_b.public_id.label('b'),
+        )
+        .outerjoin(person_a, person_a.id == FamilyRelationship.person_a_id)
+        .outerjoin(person_b, person_b.id == FamilyRelationship.person_b_id)
+        .where(FamilyRelationship.family_id == family.id)
+        .order_by(FamilyRelationship.id)
+        .execution_options(yield_per=1000)
+    )
+
+
+def load_family_rows(family: FamilyProfile) -> tuple[list, dict[int, list], list]:
+    """Fetch a family's people, migrations and relationships as plain column rows.
+
+    Three SELECTs regardless of family size, instead of lazy-loading
+    ``person.migrations`` and ``rel.person_a``/``rel.person_b`` per object.
+    """
+    people = db.session.execute(
+        db.select(*_person_columns()).where(Person.family_id == family.id).order_by(Person.id)
+    ).all()
+    migrations_by_person = _migration_rows_by_person(Person.family_id == family.id)
+    return people, migrations_by_person, _relationship_rows(family).all()
+
+
+def iter_family_person_rows(family: FamilyProfile, chunk_size: int = 500) -> Iterator[tuple[list, dict[int, list]]]:
+    """Yield ``(person rows, migration rows by person id)`` in id order, one keyset-paginated chunk at a time."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(*_person_columns())
+            .where(Person.family_id == family.id, Person.id > last_id)
+            .order_by(Person.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield rows, _migration_rows_by_person(Person.id.in_([row.id for row in rows]))
+        last_id = rows[-1].id
+
+
+def iter_family_people(family: FamilyProfile, chunk_size: int = 500) -> Iterator[list[dict]]:
+    """Yield the family's people payloads in id order, one chunk at a time."""
+    for rows, migrations_by_person in iter_family_person_rows(family, chunk_size):
+        yield [_person_payload(row, migrations_by_person.get(row.id, ()), family.family_slug) for row in rows]
+
+
+def _person_payload(person, migration_rows, family_slug: str) -> dict:
+    migrations = []
+    for migration in migration_rows:
+        entry = {'label': migration.label}
+        if migration.lat is not None:
+            entry['lat'] = migration.lat
+        if migration.lng is not None:
+            entry['lng'] = migration.lng
+        migrations.append(entry)
+    current_location = person_location_payload(person)
+    if current_location and not migrations:
+        migrations.append(dict(current_location))
+    return {
+        'id': person.public_id,
+        'name': person.name,
+        'born': person.born,
+        'died': person.died,
+        'photo': _normalize_photo_path(person.photo, family_slug),
+        'current_location': current_location,
+        'migrations': migrations,
+    }
+
+
+def _relationship_records(relationship_rows) -> list[dict]:
+    return list(_iter_relationship_records(relationship_rows))
+
+
+def _iter_relationship_records(relationship_rows) -> Iterator[dict]:
     spouse_map: dict[str, set[str]] = defaultdict(set)
-    parent_links: list[tuple[str, str]] = []
-    for rel in family.relationships:
-        a = rel.person_a.public_id if rel.person_a else ''
-        b = rel.person_b.public_id if rel.person_b else ''
+    parents_by_child: dict[str, list[str]] = defaultdict(list)
+    for rel in relationship_rows:
+        a = rel.a or ''
+        b = rel.b or ''
         if not a or not b or a == b:
             continue
         if rel.relationship_type == 'spouse':
             spouse_map[a].add(b)
             spouse_map[b].add(a)
-        else:
-            parent_links.append((a, b))
+        elif a not in parents_by_child[b]:
+            parents_by_child[b].append(a)
 
-    relationships_payload = []
     for person_a, spouses in spouse_map.items():
         for person_b in spouses:
             if person_a < person_b:
-                relationships_payload.append({'type': 'spouse', 'a': person_a, 'b': person_b})
-
-    parents_by_child: dict[str, list[str]] = defaultdict(list)
-    for parent_id, child_id in parent_links:
-        if parent_id not in parents_by_child[child_id]:
-            parents_by_child[child_id].append(parent_id)
+                yield {'type': 'spouse', 'a': person_a, 'b': person_b}
 
     for child_id, parents in parents_by_child.items():
         resolved_parents = list(parents)
@@ -495,80 +1350,221 @@ def family_to_payload(family: FamilyProfile | None) -> dict:
         record = {'parent': primary_parent, 'child': child_id, 'parentId': primary_parent, 'childId': child_id}
         if len(resolved_parents) > 1:
             record['otherParentId'] = resolved_parents[1]
-        relationships_payload.append(record)
+        yield record
+
 
+def _family_meta(family: FamilyProfile) -> dict:
     return {
-        'meta': {
-            'family_name': family.family_name,
-            'owner_username': family.user.username,
-            'profile_name': family.profile_name,
-            'profile_photo': _normalize_photo_path(family.profile_photo, family.family_slug),
-            'description': family.description,
-            'family_id': family.family_slug,
-        },
-        'people': people_payload,
-        'relationships': relationships_payload,
+        'family_name': family.family_name,
+        'owner_username': family.user.username,
+        'profile_name': family.profile_name,
+        'profile_photo': _normalize_photo_path(family.profile_photo, family.family_slug),
+        'description': family.description,
+        'family_id': family.family_slug,
+    }
+
+
+def family_to_payload(family: FamilyProfile | None) -> dict:
+    if family is None:
+        return {'meta': {}, 'people': [], 'relationships': [], 'events': []}
+
+    people_rows, migrations_by_person, relationship_rows = load_family_rows(family)
+    return {
+        'meta': _family_meta(family),
+        'people': [_person_payload(row, migrations_by_person.get(row.id, ()), family.family_slug) for row in people_rows],
+        'relationships': _relationship_records(relationship_rows),
         'events': [],
     }
 
-def locked_root_person_ids(data: dict) -> list[str]:
-    people = [dict(p) for p in data.get('people', []) if p.get('id')]
-    relationships = list(data.get('relationships', []))
-    if not people:
-        return []
 
-    people_by_id = {str(p['id']): p for p in people}
-    parent_map: dict[str, set[str]] = defaultdict(set)
+def _birth_year(person: dict) -> int | None:
+    raw = str(person.get('born') or person.get('birth') or '').strip()
+    try:
+        return int(raw)
+    except Exception:
+        return None
 
-    for rel in relationships:
-        if not isinstance(rel, dict):
-            continue
-        if rel.get('type') == 'spouse':
-            continue
-        parent = str(rel.get('parentId') or rel.get('parent') or '')
-        child = str(rel.get('childId') or rel.get('child') or '')
-        if parent in people_by_id and child in people_by_id and parent != child:
-            parent_map[child].add(parent)
-
-    def sort_key(pid: str):
-        person = people_by_id.get(pid, {})
-        raw = str(person.get('born') or person.get('birth') or '').strip()
-        try:
-            born = int(raw)
-        except Exception:
-            born = 999999
-        return (born, str(person.get('name', '')), pid)
 
-    roots = sorted([pid for pid in people_by_id if not parent_map.get(pid)], key=sort_key)
-    if not roots:
-        roots = sorted(people_by_id.keys(), key=sort_key)
-    return [roots[0]] if roots else []
+class FamilyGraph:
+    """Compiled parent/child/spouse index over a family payload.
+
+    People are addressed by integer position; ``ids[i]`` maps back to the public id.
+    """
+
+    __slots__ = (
+        'ids',
+        'index',
+        'people',
+        'names',
+        'birth_years',
+        'sort_keys',
+        'parents',
+        'children',
+        'spouses',
+        'generations',
+        'cycle_ids',
+        'parent_links',
+        'spouse_links',
+    )
 
+    def __init__(self, data: dict):
+        index: dict[str, int] = {}
+        people: list[dict] = []
+        for person in data.get('people', []):
+            if not person.get('id'):
+                continue
+            pid = str(person['id'])
+            if pid in index:
+                people[index[pid]] = person
+                continue
+            index[pid] = len(people)
+            people.append(person)
+
+        size = len(people)
+        parents: list[list[int]] = [[] for _ in range(size)]
+        children: list[list[int]] = [[] for _ in range(size)]
+        spouses: list[list[int]] = [[] for _ in range(size)]
+        parent_links = 0
+        spouse_links = 0
+
+        for rel in data.get('relationships', []):
+            if not isinstance(rel, dict):
+                continue
+            if rel.get('type') == 'spouse':
+                spouse_links += 1
+                a = index.get(str(rel.get('a') or ''))
+                b = index.get(str(rel.get('b') or ''))
+                if a is None or b is None or a == b:
+                    continue
+                # Keep the most recently listed spouse last; the layout pairs a person with it.
+                for x, y in ((a, b), (b, a)):
+                    if y in spouses[x]:
+                        spouses[x].remove(y)
+                    spouses[x].append(y)
+                continue
+            parent_key = rel.get('parentId') or rel.get('parent')
+            child_key = rel.get('childId') or rel.get('child')
+            if not parent_key or not child_key:
+                continue
+            parent_links += 1
+            child = index.get(str(child_key))
+            if child is None:
+                continue
+            # Database payloads fold the second parent into otherParentId on the same record.
+            for key in (parent_key, rel.get('otherParentId') or rel.get('other_parent_id')):
+                parent = index.get(str(key or ''))
+                if parent is None or parent == child or parent in parents[child]:
+                    continue
+                parents[child].append(parent)
+                children[parent].append(child)
+
+        self.ids = tuple(index)
+        self.index = index
+        self.people = people
+        self.names = [person.get('name', '') for person in people]
+        self.birth_years = [_birth_year(person) for person in people]
+        self.sort_keys = [
+            (999999 if born is None else born, name, pid)
+            for born, name, pid in zip(self.birth_years, self.names, self.ids)
+        ]
+        # Parents are kept in birth order, which is the order the layout averages them in.
+        self.parents = [tuple(sorted(items, key=self.sort_keys.__getitem__)) if len(items) > 1 else tuple(items) for items in parents]
+        self.children = [tuple(items) for items in children]
+        self.spouses = [tuple(items) for items in spouses]
+        self.parent_links = parent_links
+        self.spouse_links = spouse_links
+        self.generations, self.cycle_ids = self._compute_generations()
+        if self.cycle_ids:
+            report_parent_cycle(data, self.cycle_ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _compute_generations(self) -> tuple[list[int], tuple[str, ...]]:
+        """Kahn-style pass assigning each person 1 + the deepest parent generation.
+
+        People whose ancestry loops back on itself never reach zero pending
+        parents; the lowest-index one is released to break the loop and the
+        whole unresolved set is reported instead of recursing forever.
+        """
+        size = len(self.ids)
+        pending = [len(parents) for parents in self.parents]
+        generations = [0] * size
+        queue = deque(idx for idx in range(size) if not pending[idx])
+        resolved = 0
+        unresolved: list[int] = []
+        fallback = 0
+
+        while resolved < size:
+            if not queue:
+                if not unresolved:
+                    unresolved = [idx for idx in range(size) if pending[idx]]
+                while not pending[unresolved[fallback]]:
+                    fallback += 1
+                pending[unresolved[fallback]] = 0
+                queue.append(unresolved[fallback])
+            idx = queue.popleft()
+            resolved += 1
+            child_generation = generations[idx] + 1
+            for child in self.children[idx]:
+                if not pending[child]:
+                    continue
+                if generations[child] < child_generation:
+                    generations[child] = child_generation
+                pending[child] -= 1
+                if not pending[child]:
+                    queue.append(child)
+
+        return generations, tuple(self.ids[idx] for idx in unresolved)
+
+
+reported_parent_cycles = LRUCache(256)
+
+
+def report_parent_cycle(data: dict, cycle_ids: tuple[str, ...]) -> None:
+    # Graphs are rebuilt per request; warn once per family revision, not on every one.
+    source = current_family_cache_key() if has_request_context() else data.get('meta', {}).get('family_id')
+    key = (source, cycle_ids)
+    if reported_parent_cycles.get(key) is None:
+        reported_parent_cycles.set(key, True)
+        app.logger.warning('Parent cycle detected among %d people: %s', len(cycle_ids), ', '.join(cycle_ids[:10]))
+
+
+def family_graph(data: dict) -> FamilyGraph:
+    if not has_request_context():
+        return FamilyGraph(data)
+    cache = g.setdefault('family_graphs', {})
+    entry = cache.get(id(data))
+    if entry is None or entry[0] is not data:
+        entry = (data, FamilyGraph(data))
+        cache[id(data)] = entry
+    return entry[1]
+
+
+def locked_root_person_ids(data: dict, graph: FamilyGraph | None = None) -> list[str]:
+    graph = graph or family_graph(data)
+    if not len(graph):
+        return []
+    roots = [idx for idx in range(len(graph)) if not graph.parents[idx]] or range(len(graph))
+    return [graph.ids[min(roots, key=graph.sort_keys.__getitem__)]]
 
-def _normalize_family_photo_paths(data: dict, family_id: str | None = None) -> dict:
-    for person in data.get('people', []):
-        person['photo'] = _normalize_photo_path(person.get('photo') or person.get('image'), family_id)
-    meta = data.get('meta', {})
-    meta['profile_photo'] = _normalize_photo_path(meta.get('profile_photo'), family_id)
-    return data
 
+def _normalize_tree_person(raw: dict, family_id: str | None, locked_ids: set[str]) -> dict:
+    person = dict(raw)
+    person['id'] = str(person.get('id'))
+    person['photo'] = _normalize_photo_path(person.get('photo') or person.get('image'), family_id)
+    person['image'] = photo_variant_url(person['photo'], 'card')
+    person['locked'] = person['id'] in locked_ids
+    person['editable'] = not person['locked']
+    return person
 
-def normalize_tree_payload(data: dict, family_id: str | None = None) -> dict:
-    data = _normalize_family_photo_paths(json.loads(json.dumps(data or {})), family_id)
-    people = []
-    for raw in data.get('people', []):
-        if not raw.get('id'):
-            continue
-        person = dict(raw)
-        person['id'] = str(person.get('id'))
-        person['photo'] = _normalize_photo_path(person.get('photo') or person.get('image'), family_id)
-        person['image'] = person['photo']
-        people.append(person)
 
-    locked_ids = set(locked_root_person_ids(data))
-    for person in people:
-        person['locked'] = str(person.get('id')) in locked_ids
-        person['editable'] = not person['locked']
+def normalize_tree_payload(data: dict, family_id: str | None = None, locked_ids: list[str] | None = None) -> dict:
+    data = data or {}
+    locked_ids = set(locked_root_person_ids(data) if locked_ids is None else locked_ids)
+    meta = dict(data.get('meta', {}))
+    meta['profile_photo'] = _normalize_photo_path(meta.get('profile_photo'), family_id)
+    people = [_normalize_tree_person(raw, family_id, locked_ids) for raw in data.get('people', []) if raw.get('id')]
 
     relationships = []
     for rel in data.get('relationships', []):
@@ -590,271 +1586,330 @@ def normalize_tree_payload(data: dict, family_id: str | None = None) -> dict:
                 nr['otherParentId'] = str(other)
             relationships.append(nr)
 
-    return {'meta': data.get('meta', {}), 'people': people, 'relationships': relationships, 'events': data.get('events', []), 'locked_ids': list(locked_ids)}
+    return {'meta': meta, 'people': people, 'relationships': relationships, 'events': data.get('events', []), 'locked_ids': list(locked_ids)}
 
 
 # Tree/map helper functions preserved so the frontend payloads stay stable.
 def lineage_subset_to_root(data: dict, max_generations: int = 4) -> dict:
-    people = [dict(p) for p in data.get('people', []) if p.get('id')]
+    graph = family_graph(data)
     relationships = list(data.get('relationships', []))
-    people_by_id = {str(p['id']): p for p in people}
-    parent_map: dict[str, set[str]] = defaultdict(set)
-    child_map: dict[str, set[str]] = defaultdict(set)
-    spouse_map: dict[str, set[str]] = defaultdict(set)
+    if not len(graph):
+        return {**data, 'people': [], 'relationships': []}
 
-    for rel in relationships:
-        if not isinstance(rel, dict):
-            continue
-        if rel.get('type') == 'spouse':
-            a = rel.get('a')
-            b = rel.get('b')
-            if a in people_by_id and b in people_by_id and a != b:
-                spouse_map[str(a)].add(str(b))
-                spouse_map[str(b)].add(str(a))
-            continue
-        parent = rel.get('parentId') or rel.get('parent')
-        child = rel.get('childId') or rel.get('child')
-        if parent in people_by_id and child in people_by_id and parent != child:
-            parent_map[str(child)].add(str(parent))
-            child_map[str(parent)].add(str(child))
-
-    def born_key(pid: str):
-        raw = str(people_by_id.get(pid, {}).get('born') or people_by_id.get(pid, {}).get('birth') or '').strip()
-        try:
-            return int(raw)
-        except Exception:
-            return -999999
+    def born_key(idx: int) -> int:
+        born = graph.birth_years[idx]
+        return -999999 if born is None else born
 
-    leaves = [pid for pid in people_by_id if not child_map.get(pid)]
-    if not leaves:
-        leaves = list(people_by_id.keys())
-    current = sorted(leaves, key=lambda pid: (born_key(pid), people_by_id[pid].get('name', '')))[-1]
+    def name_key(idx: int):
+        return (born_key(idx), graph.names[idx])
 
-    included: list[str] = []
-    included_set: set[str] = set()
+    leaves = [idx for idx in range(len(graph)) if not graph.children[idx]] or range(len(graph))
+    current = max(leaves, key=name_key)
 
-    def include(pid: str | None):
-        if pid and pid in people_by_id and pid not in included_set:
-            included.append(pid)
-            included_set.add(pid)
+    included: list[int] = []
+    included_set: set[int] = set()
 
-    def lineage_depth(pid: str, memo: dict[str, int]) -> int:
-        if pid in memo:
-            return memo[pid]
-        parents = list(parent_map.get(pid, []))
-        if not parents:
-            memo[pid] = 0
-            return 0
-        memo[pid] = 1 + max(lineage_depth(parent, memo) for parent in parents)
-        return memo[pid]
+    def include(idx: int):
+        if idx not in included_set:
+            included.append(idx)
+            included_set.add(idx)
 
-    depth_memo: dict[str, int] = {}
+    depth = graph.generations
     generations_used = 0
-    while current and generations_used < max_generations:
+    while current is not None and generations_used < max_generations:
         include(current)
-        parents = sorted(parent_map.get(current, []), key=lambda pid: (born_key(pid), people_by_id[pid].get('name', '')))
-        for pid in parents:
-            include(pid)
+        parents = sorted(graph.parents[current], key=name_key)
+        for idx in parents:
+            include(idx)
         generations_used += 1
         if not parents:
             break
-        ranked = sorted(parents, key=lambda pid: (lineage_depth(pid, depth_memo), -born_key(pid), people_by_id[pid].get('name', '')), reverse=True)
-        next_current = None
-        for pid in ranked:
-            if parent_map.get(pid):
-                next_current = pid
-                break
-        if not next_current:
-            break
-        current = next_current
+        ranked = sorted(parents, key=lambda idx: (depth[idx], -born_key(idx), graph.names[idx]), reverse=True)
+        current = next((idx for idx in ranked if graph.parents[idx]), None)
+
+    return _graph_subset(data, graph, included)
 
+
+def _graph_subset(data: dict, graph: FamilyGraph, included: list[int]) -> dict:
+    included_ids = {graph.ids[idx] for idx in included}
     filtered_relationships = []
-    for rel in relationships:
+    for rel in data.get('relationships', []):
+        if not isinstance(rel, dict):
+            continue
         if rel.get('type') == 'spouse':
-            if rel.get('a') in included_set and rel.get('b') in included_set:
-                filtered_relationships.append(dict(rel))
+            if rel.get('a') in included_ids and rel.get('b') in included_ids:
+                filtered_relationships.append(rel)
         else:
             parent = rel.get('parentId') or rel.get('parent')
             child = rel.get('childId') or rel.get('child')
-            if parent in included_set and child in included_set:
-                filtered_relationships.append(dict(rel))
+            if parent in included_ids and child in included_ids:
+                filtered_relationships.append(rel)
 
-    return {**data, 'people': [people_by_id[pid] for pid in included if pid in people_by_id], 'relationships': filtered_relationships}
+    return {**data, 'people': [graph.people[idx] for idx in included], 'relationships': filtered_relationships}
 
 
-def family_stats(data: dict) -> dict:
-    people = data.get('people', [])
-    relationships = data.get('relationships', [])
-    spouses = [r for r in relationships if r.get('type') == 'spouse']
-    parent_links = [r for r in relationships if r.get('child') and r.get('parent')]
-
-    generations = 0
-    by_parents = defaultdict(set)
-    for rel in parent_links:
-        by_parents[rel['child']].add(rel['parent'])
+def _hidden_line_sizes(step: list[tuple[int, ...]], starts, visible: set[int]) -> dict[int, int]:
+    """How many hidden relatives lie beyond each hidden person reachable from ``starts`` along ``step``.
 
-    memo: dict[str, int] = {}
+    A depth-first pass that visits each hidden person once, so people
+    sharing relatives (a couple's children, say) don't walk them again. A
+    relative reachable along two lines (pedigree collapse) is counted once
+    per line.
+    """
+    sizes: dict[int, int] = {}
+    stack = [(idx, False) for idx in starts if idx not in visible]
+    while stack:
+        idx, expanded = stack.pop()
+        if expanded:
+            sizes[idx] = sum(1 + sizes[nxt] for nxt in step[idx] if nxt not in visible)
+            continue
+        if idx in sizes:
+            continue
+        # Claimed before its relatives are done, so a parent loop can't recurse forever.
+        sizes[idx] = 0
+        stack.append((idx, True))
+        stack.extend((nxt, False) for nxt in step[idx] if nxt not in visible and nxt not in sizes)
+    return sizes
+
+
+def branch_tree_payload(data: dict, root_id: str, ancestors: int, descendants: int) -> dict | None:
+    """Tree payload for ``root_id`` plus the given generations up and down.
+
+    Spouses of everyone shown are included. Anyone with relatives cut off by
+    the window carries a ``collapsed`` stub counting the hidden ancestors and
+    descendants, so the client can offer to expand that branch.
+    """
+    graph = family_graph(data)
+    root = graph.index.get(str(root_id))
+    if root is None:
+        return None
 
-    def generation(person_id: str) -> int:
-        if person_id in memo:
-            return memo[person_id]
-        parents = list(by_parents.get(person_id, set()))
-        if not parents:
-            memo[person_id] = 0
-            return 0
-        memo[person_id] = max(generation(parent_id) for parent_id in parents) + 1
-        return memo[person_id]
+    included = [root]
+    visible = {root}
+    for step, depth in ((graph.parents, ancestors), (graph.children, descendants)):
+        frontier = [root]
+        for _ in range(max(0, depth)):
+            reached = []
+            for idx in frontier:
+                for nxt in step[idx]:
+                    if nxt not in visible:
+                        visible.add(nxt)
+                        reached.append(nxt)
+            included.extend(reached)
+            frontier = reached
+            if not frontier:
+                break
+    for idx in list(included):
+        for spouse in graph.spouses[idx]:
+            if spouse not in visible:
+                visible.add(spouse)
+                included.append(spouse)
+
+    edge_parents = [p for idx in included for p in graph.parents[idx]]
+    edge_children = [c for idx in included for c in graph.children[idx]]
+    ancestor_sizes = _hidden_line_sizes(graph.parents, edge_parents, visible)
+    descendant_sizes = _hidden_line_sizes(graph.children, edge_children, visible)
+    stubs: dict[str, dict] = {}
+    for idx in included:
+        hidden_ancestors = sum(1 + ancestor_sizes[p] for p in graph.parents[idx] if p not in visible)
+        hidden_descendants = sum(1 + descendant_sizes[c] for c in graph.children[idx] if c not in visible)
+        if hidden_ancestors or hidden_descendants:
+            stubs[graph.ids[idx]] = {'ancestors': hidden_ancestors, 'descendants': hidden_descendants}
+
+    family_id = data.get('meta', {}).get('family_id')
+    payload = normalize_tree_payload(_graph_subset(data, graph, included), family_id, locked_root_person_ids(data))
+    for person in payload['people']:
+        if person['id'] in stubs:
+            person['collapsed'] = stubs[person['id']]
+    payload['focus'] = {'root': graph.ids[root], 'ancestors': ancestors, 'descendants': descendants}
+    return payload
 
-    for person in people:
-        generations = max(generations, generation(person['id']))
 
+def family_stats(data: dict, graph: FamilyGraph | None = None) -> dict:
+    people = data.get('people', [])
+    graph = graph or family_graph(data)
     return {
         'members': len(people),
-        'relationships': len(parent_links),
-        'couples': len(spouses),
-        'generations': generations + 1 if people else 0,
+        'relationships': graph.parent_links,
+        'couples': graph.spouse_links,
+        'generations': max(graph.generations, default=0) + 1 if people else 0,
     }
 
 
-def build_tree_layout(data: dict) -> dict:
-    people = data.get('people', [])
-    relationships = data.get('relationships', [])
-    people_by_id = {person['id']: person for person in people if person.get('id')}
+LAYOUT_CARD_W = 126
+LAYOUT_CARD_H = 194
 
-    spouse_of: dict[str, str] = {}
-    spouse_pairs: list[tuple[str, str]] = []
-    parent_map: dict[str, set[str]] = defaultdict(set)
-    child_map: dict[str, set[str]] = defaultdict(set)
 
-    for rel in relationships:
-        if rel.get('type') == 'spouse':
-            a = rel.get('a')
-            b = rel.get('b')
-            if a in people_by_id and b in people_by_id and a != b:
-                spouse_of[a] = b
-                spouse_of[b] = a
-                pair = tuple(sorted((a, b), key=lambda pid: str(people_by_id[pid].get('born', '9999'))))
-                if pair not in spouse_pairs:
-                    spouse_pairs.append(pair)
-        elif rel.get('child') and rel.get('parent'):
-            child = rel['child']
-            parent = rel['parent']
-            if child in people_by_id and parent in people_by_id and child != parent:
-                parent_map[child].add(parent)
-                child_map[parent].add(child)
-
-    def born_sort(pid: str):
-        raw = str(people_by_id[pid].get('born', '')).strip()
-        try:
-            born = int(raw) if raw else 999999
-        except Exception:
-            born = 999999
-        return (born, people_by_id[pid].get('name', ''), pid)
+class LayoutRow:
+    """One laid-out generation row, kept so the next layout can reuse it unchanged."""
 
-    gen_memo: dict[str, int] = {}
+    __slots__ = ('signature', 'people', 'connectors', 'centers', 'max_row_width')
 
-    def generation(pid: str) -> int:
-        if pid in gen_memo:
-            return gen_memo[pid]
-        parents = [p for p in parent_map.get(pid, set()) if p in people_by_id]
-        if not parents:
-            gen_memo[pid] = 0
-            return 0
-        gen_memo[pid] = max(generation(parent) for parent in parents) + 1
-        return gen_memo[pid]
+    def __init__(self, signature: tuple, people: list[dict], connectors: list[dict], centers: list[tuple[str, float]], max_row_width: float):
+        self.signature = signature
+        self.people = people
+        self.connectors = connectors
+        self.centers = centers
+        self.max_row_width = max_row_width
+
+
+def _layout_row_signature(graph: FamilyGraph, gen: int, members: list[int], family_id: str | None) -> tuple:
+    # Everything a row's placement depends on besides the rows above it.
+    ids = graph.ids
+    entries = []
+    for idx in members:
+        person = graph.people[idx]
+        spouses = graph.spouses[idx]
+        entries.append((
+            ids[idx],
+            graph.sort_keys[idx],
+            person.get('name', 'Unknown'),
+            person.get('born', ''),
+            person.get('died', ''),
+            photo_variant_url(_normalize_photo_path(person.get('photo') or person.get('image'), family_id), 'card'),
+            ids[spouses[-1]] if spouses else None,
+            tuple(ids[p] for p in graph.parents[idx]),
+        ))
+    return (gen, family_id, tuple(entries))
 
-    gens: dict[int, list[str]] = defaultdict(list)
-    for pid in people_by_id:
-        gens[generation(pid)].append(pid)
 
-    CARD_W = 126
-    CARD_H = 194
+def build_tree_layout(data: dict) -> dict:
+    return compute_tree_layout(data)[0]
+
+
+def compute_tree_layout(data: dict, previous: list[LayoutRow] | None = None) -> tuple[dict, list[LayoutRow]]:
+    """Lay out the family and return the layout plus per-row state.
+
+    Passing the rows from an earlier layout of the same family reuses every
+    leading row whose inputs are unchanged, so an edit only re-places the
+    rows from its generation down.
+    """
+    graph = family_graph(data)
+    family_id = data.get('meta', {}).get('family_id')
+    sort_keys = graph.sort_keys
+    sort_key = sort_keys.__getitem__
+    generation = graph.generations
+    parents_of = graph.parents
+    spouses_of = graph.spouses
+
+    # One global sort; bucketing keeps every row in birth order without re-sorting per row.
+    ordered = sorted(range(len(graph)), key=sort_key)
+    gens: dict[int, list[int]] = defaultdict(list)
+    for idx in ordered:
+        gens[generation[idx]].append(idx)
+
+    CARD_W = LAYOUT_CARD_W
+    CARD_H = LAYOUT_CARD_H
     SPOUSE_GAP = 30
     UNIT_GAP = 52
     GEN_GAP = 116
     SIDE_PAD = 52
     TOP_PAD = 26
+    PAIR_W = CARD_W * 2 + SPOUSE_GAP
 
-    pair_set = {frozenset((a, b)) for a, b in spouse_pairs}
+    centers: dict[int, float] = {}
 
-    def parent_anchor(pid: str, centers: dict[str, float]) -> float:
-        parents = sorted([p for p in parent_map.get(pid, set()) if p in centers], key=born_sort)
-        if not parents:
+    def parent_anchor(idx: int) -> float:
+        placed = [centers[p] for p in parents_of[idx] if p in centers]
+        if not placed:
             return 0.0
-        return sum(centers[p] for p in parents) / len(parents)
+        return sum(placed) / len(placed)
 
-    centers: dict[str, float] = {}
     people_out: list[dict] = []
     connectors: list[dict] = []
+    rows: list[LayoutRow] = []
     max_row_width = 0.0
+    consumed = bytearray(len(graph))
+    reusable = list(previous or [])
+
+    for row_number, gen in enumerate(sorted(gens)):
+        members = gens[gen]
+        signature = _layout_row_signature(graph, gen, members, family_id)
+        if row_number < len(reusable) and reusable[row_number].signature == signature:
+            row = reusable[row_number]
+            for pid, center in row.centers:
+                centers[graph.index[pid]] = center
+            people_out.extend(row.people)
+            connectors.extend(row.connectors)
+            max_row_width = row.max_row_width
+            rows.append(row)
+            continue
+        reusable = []
 
-    for gen in sorted(gens):
-        members = sorted(gens[gen], key=born_sort)
+        # Units are (anchor, born, members, width) tuples.
         units = []
-        consumed = set()
-        for pid in members:
-            if pid in consumed:
+        for idx in members:
+            if consumed[idx]:
                 continue
-            spouse = spouse_of.get(pid)
-            if spouse and spouse in gens[gen] and spouse not in consumed and frozenset((pid, spouse)) in pair_set:
-                ordered = sorted((pid, spouse), key=born_sort)
-                anchor = sum(parent_anchor(x, centers) for x in ordered) / 2 if gen > 0 else 0.0
-                units.append({'kind': 'pair', 'members': ordered, 'width': CARD_W * 2 + SPOUSE_GAP, 'anchor': anchor, 'born': min(born_sort(x) for x in ordered)})
-                consumed.update(ordered)
+            spouses = spouses_of[idx]
+            spouse = spouses[-1] if spouses else None
+            if spouse is not None and generation[spouse] == gen and not consumed[spouse]:
+                pair = (idx, spouse) if sort_keys[idx] <= sort_keys[spouse] else (spouse, idx)
+                anchor = (parent_anchor(pair[0]) + parent_anchor(pair[1])) / 2 if gen > 0 else 0.0
+                units.append((anchor, sort_keys[pair[0]], pair, PAIR_W))
+                consumed[idx] = consumed[spouse] = 1
             else:
-                anchor = parent_anchor(pid, centers) if gen > 0 else 0.0
-                units.append({'kind': 'single', 'members': [pid], 'width': CARD_W, 'anchor': anchor, 'born': born_sort(pid)})
-                consumed.add(pid)
+                anchor = parent_anchor(idx) if gen > 0 else 0.0
+                units.append((anchor, sort_keys[idx], (idx,), CARD_W))
+                consumed[idx] = 1
 
         if gen == 0:
-            units.sort(key=lambda item: item['born'])
+            units.sort(key=lambda item: item[1])
         else:
-            units.sort(key=lambda item: (item['anchor'], item['born']))
+            units.sort(key=lambda item: (item[0], item[1]))
 
-        row_width = sum(item['width'] for item in units) + UNIT_GAP * max(0, len(units) - 1)
+        row_width = sum(item[3] for item in units) + UNIT_GAP * max(0, len(units) - 1)
         max_row_width = max(max_row_width, row_width)
+        # Rows are centred on the widest row seen so far, not the final canvas width.
         canvas_width = max(760, int(max_row_width + SIDE_PAD * 2))
         y = TOP_PAD + gen * (CARD_H + GEN_GAP)
         cursor = (canvas_width - row_width) / 2
-        for item in units:
-            if item['kind'] == 'pair':
-                pid1, pid2 = item['members']
+        row_people: list[dict] = []
+        row_connectors: list[dict] = []
+        row_centers: list[tuple[str, float]] = []
+        for _, _, unit_members, width in units:
+            if len(unit_members) == 2:
                 x1 = cursor
                 x2 = cursor + CARD_W + SPOUSE_GAP
                 pair_mid_y = y + 76
-                connectors.append({'x1': round(x1 + CARD_W / 2, 1), 'y1': round(pair_mid_y, 1), 'x2': round(x2 + CARD_W / 2, 1), 'y2': round(pair_mid_y, 1)})
-                placements = [(pid1, x1), (pid2, x2)]
+                row_connectors.append({'x1': round(x1 + CARD_W / 2, 1), 'y1': round(pair_mid_y, 1), 'x2': round(x2 + CARD_W / 2, 1), 'y2': round(pair_mid_y, 1)})
+                placements = ((unit_members[0], x1), (unit_members[1], x2))
             else:
-                placements = [(item['members'][0], cursor)]
+                placements = ((unit_members[0], cursor),)
 
-            for pid, x in placements:
-                centers[pid] = x + CARD_W / 2
-                person = people_by_id[pid]
+            for idx, x in placements:
+                centers[idx] = x + CARD_W / 2
+                row_centers.append((graph.ids[idx], centers[idx]))
+                person = graph.people[idx]
                 years = f"{person.get('born', '')}-{person.get('died', '')}".strip('-')
-                people_out.append({
-                    'id': pid,
+                row_people.append({
+                    'id': graph.ids[idx],
                     'name': person.get('name', 'Unknown'),
                     'years': years,
-                    'photo': _normalize_photo_path(person.get('photo') or person.get('image'), data.get('meta', {}).get('family_id')),
+                    'photo': photo_variant_url(_normalize_photo_path(person.get('photo') or person.get('image'), family_id), 'card'),
                     'x': round(x, 1),
                     'y': round(y, 1),
                 })
-            cursor += item['width'] + UNIT_GAP
+            cursor += width + UNIT_GAP
+
+        people_out.extend(row_people)
+        connectors.extend(row_connectors)
+        rows.append(LayoutRow(signature, row_people, row_connectors, row_centers, max_row_width))
 
     canvas_width = max(760, int(max_row_width + SIDE_PAD * 2))
 
     def row_y(gen: int) -> float:
         return TOP_PAD + gen * (CARD_H + GEN_GAP)
 
-    for child in sorted(parent_map.keys(), key=born_sort):
-        if child not in centers:
+    for child in ordered:
+        if not parents_of[child] or child not in centers:
             continue
-        parents = sorted([p for p in parent_map.get(child, set()) if p in centers], key=born_sort)
+        parents = [p for p in parents_of[child] if p in centers]
         if not parents:
             continue
-        child_gen = generation(child)
-        parent_gen = min(generation(pid) for pid in parents)
-        parent_center = sum(centers[pid] for pid in parents) / len(parents)
+        child_gen = generation[child]
+        parent_gen = min(generation[idx] for idx in parents)
+        parent_center = sum(centers[idx] for idx in parents) / len(parents)
         parent_bottom = row_y(parent_gen) + CARD_H
         bus_y = parent_bottom + 34
         child_top = row_y(child_gen)
@@ -866,7 +1921,7 @@ def build_tree_layout(data: dict) -> dict:
     max_gen = max(gens.keys(), default=0)
     canvas_height = TOP_PAD + (max_gen + 1) * CARD_H + max_gen * GEN_GAP + TOP_PAD
 
-    return {
+    layout = {
         'family_name': data.get('meta', {}).get('family_name', 'Family Tree'),
         'profile_name': data.get('meta', {}).get('profile_name', ''),
         'profile_photo': data.get('meta', {}).get('profile_photo', DEFAULT_PROFILE_PHOTO),
@@ -875,44 +1930,280 @@ def build_tree_layout(data: dict) -> dict:
         'people': sorted(people_out, key=lambda p: (p['y'], p['x'], p['name'])),
         'connectors': connectors,
         'links': connectors,
-        'stats': family_stats(data),
+        'stats': family_stats(data, graph),
     }
+    return layout, rows
+
+
+class LayoutIndex:
+    """Spatial index over a layout's card rectangles and connector segments.
+
+    Boxes are bucketed into horizontal bands; inside a band they are sorted by
+    left edge, with the furthest right edge tracked per chunk so a query skips
+    whole chunks. Long bus lines cost one entry per band instead of one per
+    grid cell, which matters on canvases that are millions of pixels wide.
+    """
+
+    __slots__ = ('layout', 'band_height', 'card_bands', 'connector_bands', 'band_span')
+
+    CHUNK = 64
+
+    def __init__(self, layout: dict, band_height: int = 512):
+        self.layout = layout
+        self.band_height = band_height
+        self.card_bands = self._build([self._card_box(card) for card in layout.get('people', [])])
+        self.connector_bands = self._build([self._line_box(line) for line in layout.get('connectors', [])])
+        populated = self.card_bands.keys() | self.connector_bands.keys()
+        self.band_span = (min(populated), max(populated)) if populated else (0, -1)
+
+    @staticmethod
+    def _card_box(card: dict) -> tuple[float, float, float, float]:
+        return (card['x'], card['y'], card['x'] + LAYOUT_CARD_W, card['y'] + LAYOUT_CARD_H)
+
+    @staticmethod
+    def _line_box(line: dict) -> tuple[float, float, float, float]:
+        return (min(line['x1'], line['x2']), min(line['y1'], line['y2']), max(line['x1'], line['x2']), max(line['y1'], line['y2']))
+
+    def _band_range(self, y0: float, y1: float) -> range:
+        return range(int(y0 // self.band_height), int(y1 // self.band_height) + 1)
+
+    def _build(self, boxes: list[tuple[float, float, float, float]]) -> dict[int, tuple]:
+        entries: dict[int, list[tuple[float, float, float, float, int]]] = defaultdict(list)
+        for idx, (x0, y0, x1, y1) in enumerate(boxes):
+            for band in self._band_range(y0, y1):
+                entries[band].append((x0, y0, x1, y1, idx))
+        bands = {}
+        for band, items in entries.items():
+            items.sort()
+            chunk_right = [max(item[2] for item in items[start:start + self.CHUNK]) for start in range(0, len(items), self.CHUNK)]
+            bands[band] = ([item[0] for item in items], items, chunk_right)
+        return bands
+
+    def _search(self, bands: dict[int, tuple], x0: float, y0: float, x1: float, y1: float) -> list[int]:
+        hits: set[int] = set()
+        # Only walk bands that hold something, however tall the requested box is.
+        requested = self._band_range(y0, y1)
+        for band in range(max(requested.start, self.band_span[0]), min(requested.stop, self.band_span[1] + 1)):
+            if band not in bands:
+                continue
+            lefts, items, chunk_right = bands[band]
+            stop = bisect_right(lefts, x1)
+            for chunk, right in enumerate(chunk_right):
+                start = chunk * self.CHUNK
+                if start >= stop:
+                    break
+                if right < x0:
+                    continue
+                for bx0, by0, bx1, by1, idx in items[start:min(stop, start + self.CHUNK)]:
+                    if bx1 >= x0 and by0 <= y1 and by1 >= y0:
+                        hits.add(idx)
+        return sorted(hits)
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> dict:
+        width = self.layout.get('canvas_width', 0)
+        height = self.layout.get('canvas_height', 0)
+        x0, x1 = min(max(x0, 0), width), min(max(x1, 0), width)
+        y0, y1 = min(max(y0, 0), height), min(max(y1, 0), height)
+        cards = self.layout.get('people', [])
+        lines = self.layout.get('connectors', [])
+        visible_cards = [cards[idx] for idx in self._search(self.card_bands, x0, y0, x1, y1)]
+        visible_lines = [lines[idx] for idx in self._search(self.connector_bands, x0, y0, x1, y1)]
+        return {
+            'family_name': self.layout.get('family_name'),
+            'profile_name': self.layout.get('profile_name'),
+            'profile_photo': self.layout.get('profile_photo'),
+            'canvas_width': width,
+            'canvas_height': height,
+            'bbox': [x0, y0, x1, y1],
+            'people': visible_cards,
+            'connectors': visible_lines,
+            'links': visible_lines,
+            'stats': self.layout.get('stats', {}),
+        }
+
+
+def parse_bbox(raw: str | None) -> tuple[float, float, float, float] | None:
+    parts = str(raw or '').split(',')
+    if len(parts) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = (float(part) for part in parts)
+    except ValueError:
+        return None
+    if not all(math.isfinite(value) for value in (x0, y0, x1, y1)):
+        return None
+    return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+
+KIN_ORDINALS = ('first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth', 'ninth', 'tenth')
+KIN_TIMES = ('once', 'twice')
+
+
+def _kin_ordinal(n: int) -> str:
+    if n <= len(KIN_ORDINALS):
+        return KIN_ORDINALS[n - 1]
+    suffix = 'th' if 10 <= n % 100 <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    return f'{n}{suffix}'
+
+
+def kinship_term(up: int, down: int, half: bool = False) -> str:
+    """What A is to B when A is ``up`` and B is ``down`` generations below their closest common ancestor."""
+    if up == 0 and down == 0:
+        return 'self'
+    if up == 0:
+        return {1: 'parent', 2: 'grandparent'}.get(down) or 'great-' * (down - 2) + 'grandparent'
+    if down == 0:
+        return {1: 'child', 2: 'grandchild'}.get(up) or 'great-' * (up - 2) + 'grandchild'
+    if up == 1 and down == 1:
+        term = 'sibling'
+    elif up == 1:
+        term = 'great-' * (down - 2) + 'aunt/uncle'
+    elif down == 1:
+        term = 'great-' * (up - 2) + 'niece/nephew'
+    else:
+        removed = abs(up - down)
+        term = f'{_kin_ordinal(min(up, down) - 1)} cousin'
+        if removed:
+            term += f' {KIN_TIMES[removed - 1] if removed <= len(KIN_TIMES) else f"{removed} times"} removed'
+    return f'half-{term}' if half else term
+
+
+class KinshipIndex:
+    """Answers "how is A related to B" for one family revision.
+
+    Built once per revision from the compiled FamilyGraph. Each person's
+    ancestors are found by an upward walk (bounded by their ancestry, not
+    the family size) and memoised, so a matrix over a generation reuses
+    every walk; a pair then costs one intersection of two small maps.
+    Binary lifting or an Euler tour would need a single-parent tree, which
+    a pedigree with two parents per child and cousin marriages is not.
+    """
+
+    def __init__(self, graph: FamilyGraph, memo_size: int = 4096):
+        self.graph = graph
+        self._ancestry = LRUCache(memo_size)
+
+    def ancestry(self, idx: int) -> dict[int, tuple[int, int]]:
+        """``{ancestor: (generations up, next person down towards idx)}``, including idx itself at 0."""
+        found = self._ancestry.get(idx)
+        if found is None:
+            found = {idx: (0, idx)}
+            frontier = [idx]
+            distance = 0
+            while frontier:
+                distance += 1
+                upper = []
+                for person in frontier:
+                    for parent in self.graph.parents[person]:
+                        if parent not in found:
+                            found[parent] = (distance, person)
+                            upper.append(parent)
+                frontier = upper
+            self._ancestry.set(idx, found)
+        return found
+
+    def _line(self, idx: int, ancestor: int) -> list[int]:
+        ancestry = self.ancestry(idx)
+        line = [ancestor]
+        while line[-1] != idx:
+            line.append(ancestry[line[-1]][1])
+        return line
+
+    def blood(self, a: int, b: int) -> dict | None:
+        up_a, up_b = self.ancestry(a), self.ancestry(b)
+        small, large = (up_a, up_b) if len(up_a) <= len(up_b) else (up_b, up_a)
+        common = [(distance + large[idx][0], idx) for idx, (distance, _) in small.items() if idx in large]
+        if not common:
+            return None
+        best = min(total for total, _ in common)
+        closest = sorted((idx for total, idx in common if total == best), key=self.graph.sort_keys.__getitem__)
+        lca = closest[0]
+        up, down = up_a[lca][0], up_b[lca][0]
+        half = False
+        if len(closest) == 1 and up and down:
+            # Half relations: each side descends from the ancestor through someone with another, different parent.
+            half = len(self.graph.parents[up_a[lca][1]]) > 1 and len(self.graph.parents[up_b[lca][1]]) > 1
+        return {
+            'term': kinship_term(up, down, half),
+            'generations': [up, down],
+            'common_ancestors': closest,
+            'path': self._line(a, lca)[::-1] + self._line(b, lca)[1:],
+        }
+
+    def relate(self, a: int, b: int) -> dict:
+        found = self.blood(a, b)
+        if found is None:
+            found = self._by_marriage(a, b)
+        ids = self.graph.ids
+        if found is None:
+            return {'a': ids[a], 'b': ids[b], 'related': False, 'term': None, 'path': []}
+        return {
+            'a': ids[a],
+            'b': ids[b],
+            'related': True,
+            'term': found['term'],
+            'generations': found.get('generations'),
+            'common_ancestors': [ids[idx] for idx in found.get('common_ancestors', [])],
+            'path': [ids[idx] for idx in found['path']],
+        }
+
+    def _by_marriage(self, a: int, b: int) -> dict | None:
+        spouses = self.graph.spouses
+        if b in spouses[a]:
+            return {'term': 'spouse', 'path': [a, b]}
+        # One marriage away on either side; the closest blood link through it wins.
+        options = []
+        for spouse in spouses[b]:
+            found = self.blood(a, spouse)
+            if found:
+                term = {'parent': 'parent-in-law', 'sibling': 'sibling-in-law', 'child': 'stepchild'}.get(found['term'], f'{found["term"]} by marriage')
+                options.append((sum(found['generations']), {'term': term, 'path': found['path'] + [b]}))
+        for spouse in spouses[a]:
+            found = self.blood(spouse, b)
+            if found:
+                term = {'child': 'child-in-law', 'sibling': 'sibling-in-law', 'parent': 'stepparent'}.get(found['term'], f'{found["term"]} by marriage')
+                options.append((sum(found['generations']), {'term': term, 'path': [a] + found['path']}))
+        return min(options, key=lambda option: option[0])[1] if options else None
 
 
 def enrich_family_data(payload: dict, family_id: str | None = None) -> dict:
-    data = json.loads(json.dumps(payload or {}))
-    data.setdefault('meta', {})
+    payload = payload or {}
+    meta = dict(payload.get('meta') or {})
     if family_id:
-        data['meta'].setdefault('family_id', family_id)
-    data.setdefault('people', [])
-    data.setdefault('relationships', [])
-    data.setdefault('events', [])
-
-    for person in data['people']:
-        route: list[dict] = []
-        seen = set()
-
-        def add_location(loc: dict | None):
-            item = canonical_location(loc)
-            if not item:
-                return
-            key = (item.get('label'), item.get('lat'), item.get('lng'))
-            if key in seen:
-                return
-            seen.add(key)
-            route.append(item)
-
-        for loc in person.get('migrations', []):
-            add_location(loc)
-        add_location(person.get('current_location'))
+        meta.setdefault('family_id', family_id)
+    return {
+        **payload,
+        'meta': meta,
+        'people': [_enrich_person(dict(person), family_id) for person in payload.get('people', [])],
+        'relationships': payload.get('relationships', []),
+        'events': payload.get('events', []),
+    }
 
-        person['migrations'] = route
-        person['photo'] = _normalize_photo_path(person.get('photo') or person.get('image'), family_id)
-        person.setdefault('location', route[0] if route else {})
-        if route:
-            person['current_location'] = route[-1]
 
-    return data
+def _enrich_person(person: dict, family_id: str | None) -> dict:
+    route: list[dict] = []
+    seen = set()
+
+    def add_location(loc: dict | None):
+        item = canonical_location(loc)
+        if not item:
+            return
+        key = (item.get('label'), item.get('lat'), item.get('lng'))
+        if key in seen:
+            return
+        seen.add(key)
+        route.append(item)
+
+    for loc in person.get('migrations', []):
+        add_location(loc)
+    add_location(person.get('current_location'))
+
+    person['migrations'] = route
+    person['photo'] = _normalize_photo_path(person.get('photo') or person.get('image'), family_id)
+    person.setdefault('location', route[0] if route else {})
+    if route:
+        person['current_location'] = route[-1]
+    return person
 
 
 def current_sample_family() -> dict:
@@ -920,6 +2211,13 @@ def current_sample_family() -> dict:
     return enrich_family_data(load_sample_family(sid), sid)
 
 
+def sample_landing_summary() -> dict:
+    body = sample_artifact.body(current_family_cache_key(), ('landing', datetime.now().year))
+    if body is not None:
+        return app.json.loads(body)
+    return landing_summary_from_family(current_sample_family())
+
+
 def current_family_payload() -> dict:
     user = current_user()
     if user:
@@ -949,7 +2247,7 @@ def landing_summary_from_family(data: dict) -> dict:
     ancestor = family_ancestor(data)
     if ancestor:
         ancestor = dict(ancestor)
-        ancestor['photo'] = _normalize_photo_path(ancestor.get('photo') or ancestor.get('image'), data.get('meta', {}).get('family_id'))
+        ancestor['photo'] = photo_variant_url(_normalize_photo_path(ancestor.get('photo') or ancestor.get('image'), data.get('meta', {}).get('family_id')), 'card')
     people = data.get('people', [])
     migration_places = []
     seen_places = set()
@@ -1007,34 +2305,327 @@ def map_people_payload(data: dict) -> dict:
     people_payload = []
     all_places = []
     seen_places = set()
+    family_id = data.get('meta', {}).get('family_id')
     for person in data.get('people', []):
-        migrations = person.get('migrations', [])
-        coords_path = []
-        for loc in migrations:
-            if loc.get('lng') in (None, '') or loc.get('lat') in (None, ''):
-                continue
-            coords = [float(loc['lng']), float(loc['lat'])]
-            coords_path.append(coords)
-            place_key = (loc.get('label'), coords[0], coords[1])
-            if place_key not in seen_places:
-                seen_places.add(place_key)
-                all_places.append({'name': loc.get('label') or format_place(loc), 'coords': coords, 'kind': 'migration'})
-        if not coords_path:
-            continue
-        years = f"{person.get('born', '')}-{person.get('died', '')}".strip('-')
-        people_payload.append({
-            'id': person.get('id'),
-            'name': person.get('name'),
-            'years': years,
-            'image': _normalize_photo_path(person.get('photo') or person.get('image'), data.get('meta', {}).get('family_id')),
-            'label': format_place(person.get('current_location') or person.get('location')) or (person.get('current_location') or {}).get('label', ''),
-            'placeLabels': [loc.get('label') or format_place(loc) for loc in migrations if (loc.get('label') or format_place(loc))],
-            'path': coords_path,
-            'route': coords_path,
-        })
+        entry = _map_person(person, family_id, seen_places, all_places)
+        if entry:
+            people_payload.append(entry)
     return {'people': people_payload, 'places': all_places}
 
 
+def _map_person(person: dict, family_id: str | None, seen_places: set, all_places: list[dict]) -> dict | None:
+    migrations = person.get('migrations', [])
+    coords_path = []
+    for loc in migrations:
+        if loc.get('lng') in (None, '') or loc.get('lat') in (None, ''):
+            continue
+        coords = [float(loc['lng']), float(loc['lat'])]
+        coords_path.append(coords)
+        place_key = (loc.get('label'), coords[0], coords[1])
+        if place_key not in seen_places:
+            seen_places.add(place_key)
+            all_places.append({'name': loc.get('label') or format_place(loc), 'coords': coords, 'kind': 'migration'})
+    if not coords_path:
+        return None
+    years = f"{person.get('born', '')}-{person.get('died', '')}".strip('-')
+    return {
+        'id': person.get('id'),
+        'name': person.get('name'),
+        'years': years,
+        'image': photo_variant_url(_normalize_photo_path(person.get('photo') or person.get('image'), family_id), 'avatar'),
+        'label': format_place(person.get('current_location') or person.get('location')) or (person.get('current_location') or {}).get('label', ''),
+        'placeLabels': [loc.get('label') or format_place(loc) for loc in migrations if (loc.get('label') or format_place(loc))],
+        'path': coords_path,
+        'route': coords_path,
+    }
+
+
+def _compact_json(value) -> str:
+    return app.json.dumps(value, separators=(',', ':'))
+
+
+def _locked_root_from_db(family: FamilyProfile) -> list[str]:
+    """locked_root_person_ids for a stored family, computed from streamed column scans."""
+    children = set(db.session.scalars(
+        db.select(FamilyRelationship.person_b_id).where(
+            FamilyRelationship.family_id == family.id,
+            FamilyRelationship.relationship_type != 'spouse',
+            FamilyRelationship.person_a_id != FamilyRelationship.person_b_id,
+        )
+    ))
+    rows = db.session.execute(
+        db.select(Person.id, Person.public_id, Person.name, Person.born)
+        .where(Person.family_id == family.id)
+        .execution_options(yield_per=1000)
+    )
+    best_root = None
+    best_any = None
+    for row in rows:
+        born = _birth_year({'born': row.born})
+        key = (999999 if born is None else born, row.name, row.public_id)
+        if best_any is None or key < best_any:
+            best_any = key
+        if row.id not in children and (best_root is None or key < best_root):
+            best_root = key
+    best = best_root or best_any
+    return [best[2]] if best else []
+
+
+def stream_tree_payload(family_pk: int) -> Iterator[str]:
+    """Yield the same JSON as normalize_tree_payload(current family) without materialising it.
+
+    People are read, enriched and serialised one chunk at a time and the
+    locked root comes from a column scan, so only the relationship ids are
+    held in memory for the whole request. Takes the primary key because the
+    view's session is gone by the time a streamed body is iterated.
+    """
+    family = db.session.get(FamilyProfile, family_pk)
+    slug = family.family_slug
+    head = normalize_tree_payload(
+        enrich_family_data({'meta': _family_meta(family), 'people': [], 'relationships': [], 'events': []}, slug),
+        slug,
+        _locked_root_from_db(family),
+    )
+    locked_set = set(head['locked_ids'])
+
+    yield f'{{"events":{_compact_json(head["events"])},"locked_ids":{_compact_json(head["locked_ids"])},"meta":{_compact_json(head["meta"])},"people":['
+    separator = ''
+    for chunk in iter_family_people(family):
+        yield separator + ','.join(_compact_json(_normalize_tree_person(_enrich_person(person, slug), slug, locked_set)) for person in chunk)
+        separator = ','
+
+    # Records built from database rows are already in normalize_tree_payload's output shape.
+    yield '],"relationships":['
+    separator = ''
+    records = _iter_relationship_records(_relationship_rows(family))
+    while True:
+        chunk = [_compact_json(record) for record in islice(records, 1000)]
+        if not chunk:
+            break
+        yield separator + ','.join(chunk)
+        separator = ','
+    yield ']}\n'
+
+
+def stream_people_payload(family_pk: int) -> Iterator[str]:
+    family = db.session.get(FamilyProfile, family_pk)
+    slug = family.family_slug
+    seen_places: set = set()
+    all_places: list[dict] = []
+    yield '{"people":['
+    separator = ''
+    for chunk in iter_family_people(family):
+        entries = (_map_person(_enrich_person(person, slug), slug, seen_places, all_places) for person in chunk)
+        body = ','.join(_compact_json(entry) for entry in entries if entry)
+        if body:
+            yield separator + body
+            separator = ','
+    yield f'],"places":{_compact_json(all_places)}}}\n'
+
+
+def _export_relationship(row) -> dict | None:
+    if not row.a or not row.b or row.a == row.b:
+        return None
+    if row.relationship_type == 'spouse':
+        return {'type': 'spouse', 'a': row.a, 'b': row.b}
+    return {'parent': row.a, 'child': row.b}
+
+
+def export_family_json(family_pk: int) -> Iterator[str]:
+    """Stream the family in the data/samples format, which import_family_json reads back."""
+    family = db.session.get(FamilyProfile, family_pk)
+    yield f'{{"meta":{_compact_json(_family_meta(family))},"people":['
+    separator = ''
+    for chunk in iter_family_people(family):
+        yield separator + ','.join(_compact_json(person) for person in chunk)
+        separator = ','
+    yield '],"relationships":['
+    separator = ''
+    records = filter(None, map(_export_relationship, _relationship_rows(family)))
+    while True:
+        chunk = [_compact_json(record) for record in islice(records, 1000)]
+        if not chunk:
+            break
+        yield separator + ','.join(chunk)
+        separator = ','
+    yield '],"events":[]}\n'
+
+
+def export_family_ndjson(family_pk: int) -> Iterator[str]:
+    """One ``{"kind": ..., "data": ...}`` line for the meta, each person and each relationship."""
+    family = db.session.get(FamilyProfile, family_pk)
+    yield _compact_json({'kind': 'meta', 'data': _family_meta(family)}) + '\n'
+    for chunk in iter_family_people(family):
+        yield ''.join(_compact_json({'kind': 'person', 'data': person}) + '\n' for person in chunk)
+    records = filter(None, map(_export_relationship, _relationship_rows(family)))
+    while True:
+        chunk = [_compact_json({'kind': 'relationship', 'data': record}) + '\n' for record in islice(records, 1000)]
+        if not chunk:
+            break
+        yield ''.join(chunk)
+
+
+def _gedcom_text(value) -> str:
+    # A lone @ would start a cross-reference pointer; GEDCOM escapes it as @@.
+    return ' '.join(str(value or '').split()).replace('@', '@@')
+
+
+def _gedcom_place_lines(level: int, label: str, lat, lng) -> list[str]:
+    lines = [f'{level} PLAC {_gedcom_text(label)}']
+    if lat is not None and lng is not None:
+        lines += [
+            f'{level + 1} MAP',
+            f'{level + 2} LATI {"S" if lat < 0 else "N"}{abs(lat)}',
+            f'{level + 2} LONG {"W" if lng < 0 else "E"}{abs(lng)}',
+        ]
+    return lines
+
+
+def _gedcom_individual(row, migration_rows) -> list[str]:
+    names = _gedcom_text(row.name).rsplit(' ', 1)
+    lines = [f'0 @I{row.id}@ INDI', f'1 NAME {names[0]} /{names[1]}/' if len(names) == 2 else f'1 NAME {names[0]}']
+    places = [(migration.label, migration.lat, migration.lng) for migration in migration_rows]
+    if row.current_location_label and (not places or places[-1][0] != row.current_location_label):
+        places.append((row.current_location_label, row.current_location_lat, row.current_location_lng))
+    if row.born or places:
+        lines.append('1 BIRT')
+        if row.born:
+            lines.append(f'2 DATE {text_to_gedcom_date(row.born)}')
+        if places:
+            lines += _gedcom_place_lines(2, *places[0])
+    for place in places[1:]:
+        lines.append('1 RESI')
+        lines += _gedcom_place_lines(2, *place)
+    if row.died:
+        lines += ['1 DEAT', f'2 DATE {text_to_gedcom_date(row.died)}']
+    return lines
+
+
+def _gedcom_couples(family_pk: int) -> Iterator[tuple[int, int, int | None]]:
+    """``(parent, other parent, child or None)`` sorted by couple, for grouping into FAM records.
+
+    A child's parents are paired off in id order, so a third (adoptive,
+    step) parent lands in a FAM of its own instead of being dropped.
+    """
+    rank = func.row_number().over(partition_by=FamilyRelationship.person_b_id, order_by=FamilyRelationship.person_a_id)
+    links = (
+        db.select(FamilyRelationship.person_a_id.label('parent'), FamilyRelationship.person_b_id.label('child'), ((rank - 1) // 2).label('pair'))
+        .where(FamilyRelationship.family_id == family_pk, FamilyRelationship.relationship_type == 'parent')
+        .subquery()
+    )
+    first, second = func.min(links.c.parent), func.max(links.c.parent)
+    parent_rows = db.session.execute(
+        db.select(first, second, links.c.child)
+        .group_by(links.c.child, links.c.pair)
+        .order_by(first, second, links.c.child)
+        .execution_options(yield_per=1000)
+    )
+    a, b = FamilyRelationship.person_a_id, FamilyRelationship.person_b_id
+    low, high = case((a < b, a), else_=b), case((a < b, b), else_=a)
+    spouse_rows = db.session.execute(
+        db.select(low, high, db.null())
+        .where(FamilyRelationship.family_id == family_pk, FamilyRelationship.relationship_type == 'spouse', a != b)
+        .distinct()
+        .order_by(low, high)
+        .execution_options(yield_per=1000)
+    )
+    return merge(map(tuple, parent_rows), map(tuple, spouse_rows), key=lambda row: (row[0], row[1]))
+
+
+def export_family_gedcom(family_pk: int) -> Iterator[str]:
+    """Stream the family as GEDCOM 5.5.1; import_gedcom reads it back."""
+    family = db.session.get(FamilyProfile, family_pk)
+    yield '\n'.join([
+        '0 HEAD', '1 SOUR LineageMap', '1 GEDC', '2 VERS 5.5.1', '2 FORM LINEAGE-LINKED', '1 CHAR UTF-8',
+        '0 @SUBM@ SUBM', f'1 NAME {_gedcom_text(family.profile_name)}',
+    ]) + '\n'
+    for rows, migrations_by_person in iter_family_person_rows(family):
+        yield ''.join('\n'.join(_gedcom_individual(row, migrations_by_person.get(row.id, ()))) + '\n' for row in rows)
+
+    lines: list[str] = []
+    for number, ((first, second), group) in enumerate(groupby(_gedcom_couples(family_pk), key=lambda row: (row[0], row[1])), 1):
+        lines += [f'0 @F{number}@ FAM', f'1 HUSB @I{first}@']
+        if second != first:
+            lines.append(f'1 WIFE @I{second}@')
+        lines += [f'1 CHIL @I{child}@' for child in dict.fromkeys(row[2] for row in group if row[2] is not None)]
+        if len(lines) >= 2000:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    yield '\n'.join(lines + ['0 TRLR']) + '\n'
+
+
+# format -> (generator, mimetype, file extension)
+FAMILY_EXPORTERS = {
+    'json': (export_family_json, 'application/json', 'json'),
+    'ndjson': (export_family_ndjson, 'application/x-ndjson', 'ndjson'),
+    'gedcom': (export_family_gedcom, 'text/plain; charset=utf-8', 'ged'),
+}
+
+
+def streamable_family() -> FamilyProfile | None:
+    """The logged-in family if this request should get a streamed body.
+
+    Streaming is used when asked for with ``?stream=1`` or when the family is
+    large enough that building and caching the whole body would be wasteful.
+    """
+    user = current_user()
+    family = family_profile_for_user(user.username) if user else None
+    if family is None:
+        return None
+    if (request.args.get('stream') or '').strip().lower() in {'1', 'true', 'yes'}:
+        return family
+    size = db.session.scalar(db.select(func.count(Person.id)).where(Person.family_id == family.id))
+    return family if size >= STREAM_PEOPLE_THRESHOLD else None
+
+
+def current_family_cache_key() -> tuple | None:
+    if 'family_cache_key' in g:
+        return g.family_cache_key
+    user = current_user()
+    if user:
+        family = family_profile_for_user(user.username)
+        key = ('family', family.id, family.revision, photo_variants_stamp(family.family_slug, family_photo_blobs(family))) if family else None
+    else:
+        sid = selected_family_id()
+        stamp = sample_registry.stamp(sid)
+        key = ('sample', sid, stamp, photo_variants_stamp(sid, sample_photo_blobs(sid, stamp)))
+    g.family_cache_key = key
+    return key
+
+
+def cached_payload_response(view_key: tuple, build, store: bool = True, stream=None):
+    source = current_family_cache_key()
+    if source is None:
+        return build()
+
+    key = (PAYLOAD_SCHEMA_VERSION, *source, *view_key)
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        body = payload_cache.get(key) if store else None
+        if body is None and source[0] == 'sample':
+            body = sample_artifact.body(source, view_key)
+        family = streamable_family() if body is None and stream is not None else None
+        if family is not None:
+            response = app.response_class(stream_with_context(stream(family.id)), mimetype=app.json.mimetype)
+        else:
+            if body is None:
+                body = app.json.response(build()).get_data()
+                if store:
+                    payload_cache.set(key, body)
+            response = app.response_class(body, mimetype=app.json.mimetype)
+
+    response.set_etag(etag)
+    response.vary.add('Cookie')
+    response.cache_control.private = True
+    if source[0] == 'sample':
+        response.cache_control.max_age = SAMPLE_MAX_AGE
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
 @app.context_processor
 def inject_helpers():
     logged_in = current_user()
@@ -1050,9 +2641,8 @@ def inject_helpers():
 @app.route('/')
 def index():
     user = current_user()
-    family = current_family_payload() if user else current_sample_family()
-    data = landing_summary_from_family(family)
-    return render_template('index.html', data=data, landing_family=family, user=user, mapbox_public_token=MAPBOX_PUBLIC_TOKEN, landing_tree_api_url='/api/current-family/tree?scope=lineage&generations=4')
+    data = landing_summary_from_family(current_family_payload()) if user else sample_landing_summary()
+    return render_template('index.html', data=data, user=user, mapbox_public_token=MAPBOX_PUBLIC_TOKEN, landing_tree_api_url='/api/current-family/tree?scope=lineage&generations=4')
 
 
 @app.get('/select-family')
@@ -1074,7 +2664,7 @@ def login():
             flash('Invalid username or password.')
             return redirect(url_for('login'))
         session['username'] = username
-        ensure_user_family(username)
+        family_profile_for_user(username)
         return redirect(url_for('dashboard'))
     return render_template('login.html')
 
@@ -1146,21 +2736,129 @@ def tree():
     elif user:
         family = current_family_payload()
     else:
-        family_id = selected_family_id()
-        family = enrich_family_data(load_sample_family(family_id), family_id)
+        family = load_sample_family()
     family_name = family.get('meta', {}).get('family_name', 'Family Tree')
     return render_template('tree.html', family_name=family_name, tree_api_url='/api/current-family/tree', tree_editor_enabled=bool(user), tree_branch_api_url=url_for('api_tree_add_branch'), tree_update_api_url=url_for('api_tree_update_node'), tree_delete_api_url=url_for('api_tree_delete_node'))
 
 
 @app.get('/api/current-family/tree')
 def api_current_family_tree():
-    family = current_family_payload()
     scope = (request.args.get('scope') or '').strip().lower()
-    generations = request.args.get('generations', type=int) or 4
-    if scope == 'lineage':
-        family = lineage_subset_to_root(family, max_generations=max(1, generations))
-    family_id = family.get('meta', {}).get('family_id')
-    return normalize_tree_payload(family, family_id)
+    if scope == 'focus':
+        generations = max(1, request.args.get('generations', type=int) or 2)
+        return branch_payload_response((request.args.get('root') or '').strip(), generations, generations)
+
+    scope = 'lineage' if scope == 'lineage' else 'full'
+    generations = max(1, request.args.get('generations', type=int) or 4) if scope == 'lineage' else 0
+
+    def build() -> dict:
+        family = current_family_payload()
+        if scope == 'lineage':
+            family = lineage_subset_to_root(family, max_generations=generations)
+        family_id = family.get('meta', {}).get('family_id')
+        return normalize_tree_payload(family, family_id)
+
+    stream = stream_tree_payload if scope == 'full' else None
+    return cached_payload_response(('tree', scope, generations), build, stream=stream)
+
+
+def branch_payload_response(root_id: str, ancestors: int, descendants: int):
+    def build() -> dict:
+        family = current_family_payload()
+        root = root_id or next(iter(locked_root_person_ids(family)), '')
+        payload = branch_tree_payload(family, root, ancestors, descendants)
+        if payload is None:
+            raise LookupError(root)
+        return payload
+
+    try:
+        return cached_payload_response(('branch', root_id, ancestors, descendants), build)
+    except LookupError:
+        return {'ok': False, 'error': 'person_not_found'}, 404
+
+
+@app.get('/api/current-family/tree/expand')
+def api_current_family_tree_expand():
+    person_id = (request.args.get('person') or '').strip()
+    if not person_id:
+        return {'ok': False, 'error': 'person_required'}, 400
+    generations = max(1, request.args.get('generations', type=int) or 1)
+    direction = (request.args.get('direction') or 'descendants').strip().lower()
+    if direction not in {'ancestors', 'descendants', 'both'}:
+        return {'ok': False, 'error': 'invalid_direction'}, 400
+    ancestors = generations if direction in {'ancestors', 'both'} else 0
+    descendants = generations if direction in {'descendants', 'both'} else 0
+    return branch_payload_response(person_id, ancestors, descendants)
+
+
+def current_family_layout() -> dict:
+    family = current_family_payload()
+    rows_key = (bool(current_user()), family.get('meta', {}).get('family_id'))
+    layout, rows = compute_tree_layout(family, layout_rows_cache.get(rows_key))
+    layout_rows_cache.set(rows_key, rows)
+    return layout
+
+
+def current_family_layout_index() -> LayoutIndex:
+    key = (PAYLOAD_SCHEMA_VERSION, current_family_cache_key())
+    index = layout_index_cache.get(key)
+    if index is None:
+        index = LayoutIndex(current_family_layout())
+        layout_index_cache.set(key, index)
+    return index
+
+
+@app.get('/api/current-family/tree/layout')
+def api_current_family_tree_layout():
+    raw_bbox = request.args.get('bbox')
+    if raw_bbox is None:
+        return cached_payload_response(('layout',), current_family_layout)
+
+    bbox = parse_bbox(raw_bbox)
+    if bbox is None:
+        return {'ok': False, 'error': 'invalid_bbox'}, 400
+    return cached_payload_response(('layout', bbox), lambda: current_family_layout_index().query(*bbox), store=False)
+
+
+def current_family_kinship_index() -> KinshipIndex:
+    key = (PAYLOAD_SCHEMA_VERSION, current_family_cache_key())
+    index = kinship_index_cache.get(key)
+    if index is None:
+        index = KinshipIndex(family_graph(current_family_payload()))
+        kinship_index_cache.set(key, index)
+    return index
+
+
+@app.get('/api/current-family/relationship')
+def api_current_family_relationship():
+    """Kinship of ``a`` to ``b``; comma-separated lists, or ``generation=N``, give every pair."""
+    def people(name: str) -> list[str]:
+        return [item.strip() for item in (request.args.get(name) or '').split(',') if item.strip()]
+
+    first, second = people('a'), people('b')
+    generation = request.args.get('generation', type=int)
+    if generation is None and (not first or not second):
+        return {'ok': False, 'error': 'people_required'}, 400
+
+    index = current_family_kinship_index()
+    graph = index.graph
+    if generation is not None:
+        members = [idx for idx, value in enumerate(graph.generations) if value == generation]
+        first = second = [graph.ids[idx] for idx in sorted(members, key=graph.sort_keys.__getitem__)]
+    pairs = [(a, b) for a in first for b in second if generation is None or a != b]
+    if len(pairs) > KINSHIP_MAX_PAIRS:
+        return {'ok': False, 'error': 'too_many_pairs', 'max_pairs': KINSHIP_MAX_PAIRS}, 400
+    missing = next((pid for pid in (*first, *second) if pid not in graph.index), None)
+    if missing is not None:
+        return {'ok': False, 'error': 'person_not_found', 'person_id': missing}, 404
+
+    def build() -> dict:
+        results = [index.relate(graph.index[a], graph.index[b]) for a, b in pairs]
+        if generation is None and len(results) == 1:
+            return {'ok': True, **results[0]}
+        return {'ok': True, 'relationships': results}
+
+    return cached_payload_response(('relationship', tuple(first), tuple(second), generation), build, store=False)
 
 
 @app.route('/map')
@@ -1170,12 +2868,33 @@ def map_view():
 
 @app.get('/api/current-family/people')
 def api_current_family_people():
-    return map_people_payload(current_family_payload())
+    return cached_payload_response(('people',), lambda: map_people_payload(current_family_payload()), stream=stream_people_payload)
+
+
+@app.get('/api/current-family/export')
+def api_current_family_export():
+    user = current_user()
+    if not user:
+        return {'ok': False, 'error': 'login_required'}, 401
+
+    export_format = (request.args.get('format') or 'json').lower()
+    if export_format not in FAMILY_EXPORTERS:
+        return {'ok': False, 'error': 'unsupported_format', 'formats': sorted(FAMILY_EXPORTERS)}, 400
+
+    family = family_profile_for_user(user.username)
+    if not family:
+        return {'ok': False, 'error': 'family_not_found'}, 404
+
+    exporter, mimetype, extension = FAMILY_EXPORTERS[export_format]
+    response = app.response_class(stream_with_context(exporter(family.id)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{family.family_slug}.{extension}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
 
 
 @app.get('/api/family/current/people')
 def api_family_current_people_alias():
-    return map_people_payload(current_family_payload())
+    return api_current_family_people()
 
 
 @app.post('/profile/update')
@@ -1191,6 +2910,7 @@ def update_profile():
     family.profile_name = request.form.get('profile_name', '').strip() or user.display_name
     family.family_name = request.form.get('family_name', '').strip() or f'{family.profile_name} Family'
     profile_photo = request.form.get('profile_photo', '').strip()
+    previous_photo = family.profile_photo
     if profile_photo:
         family.profile_photo = _normalize_photo_path(profile_photo, family.family_slug)
 
@@ -1199,7 +2919,10 @@ def update_profile():
         root_person.name = family.profile_name
 
     user.display_name = family.profile_name
+    bump_family_revision(family)
     db.session.commit()
+    if previous_photo != family.profile_photo:
+        collect_photo_blobs([previous_photo])
     flash('Profile updated.')
     return redirect(url_for('dashboard'))
 
@@ -1219,18 +2942,20 @@ def add_person():
         flash('Name is required.')
         return redirect(url_for('dashboard'))
 
-    person_id = unique_person_public_id(request.form.get('person_id', '') or name)
+    def save() -> None:
+        person = Person(
+            family=family,
+            public_id=unique_person_public_id(request.form.get('person_id', '') or name),
+            name=name,
+            born=request.form.get('born', '').strip(),
+            died=request.form.get('died', '').strip(),
+            photo=_normalize_photo_path(request.form.get('photo', '').strip(), family.family_slug),
+        )
+        db.session.add(person)
+        bump_family_revision(family)
+        db.session.commit()
 
-    person = Person(
-        family=family,
-        public_id=person_id,
-        name=name,
-        born=request.form.get('born', '').strip(),
-        died=request.form.get('died', '').strip(),
-        photo=_normalize_photo_path(request.form.get('photo', '').strip(), family.family_slug),
-    )
-    db.session.add(person)
-    db.session.commit()
+    retry_on_conflict(save)
     flash(f'{name} added.')
     return redirect(url_for('dashboard'))
 
@@ -1263,17 +2988,52 @@ def add_relationship():
         relationship_type = 'spouse'
         flash('Spouse connection added.')
     elif rel_type == 'parent-child':
+        if creates_ancestry_cycle(family.id, person_a.id, person_b.id):
+            flash('That connection would make someone their own ancestor.')
+            return redirect(url_for('dashboard'))
         relationship_type = 'parent'
+        index_parent_link(family.id, person_a.id, person_b.id)
         flash('Parent-child connection added.')
     else:
         flash('Unsupported relationship type.')
         return redirect(url_for('dashboard'))
 
     db.session.add(FamilyRelationship(family=family, relationship_type=relationship_type, person_a=person_a, person_b=person_b))
+    bump_family_revision(family)
     db.session.commit()
     return redirect(url_for('dashboard'))
 
 
+@app.post('/api/current-family/import')
+def api_current_family_import():
+    user = current_user()
+    if not user:
+        return {'ok': False, 'error': 'login_required'}, 401
+
+    family = family_profile_for_user(user.username)
+    if not family:
+        return {'ok': False, 'error': 'family_not_found'}, 404
+
+    upload = request.files.get('file')
+    try:
+        data = app.json.loads(upload.read()) if upload else request.get_json(silent=False)
+    except Exception:
+        return {'ok': False, 'error': 'invalid_json'}, 400
+
+    errors = validate_family_json(data)
+    if errors:
+        return {'ok': False, 'error': 'invalid_family', 'details': errors[:20]}, 400
+
+    replace = request.args.get('replace', '').lower() in {'1', 'true', 'yes'}
+    try:
+        stats = import_family_json(family, data, replace=replace)
+    except Exception as exc:
+        db.session.rollback()
+        app.logger.exception('Family import failed')
+        return {'ok': False, 'error': str(exc)}, 500
+    return {'ok': True, **stats}
+
+
 @app.post('/api/tree/upload-photo')
 def api_tree_upload_photo():
     user = current_user()
@@ -1289,177 +3049,924 @@ def api_tree_upload_photo():
         return {'ok': False, 'error': 'family_not_found'}, 404
 
     ext = Path(upload.filename).suffix.lower()
-    if ext not in {'.jpg', '.jpeg', '.png', '.webp', '.gif'}:
+    if ext not in PHOTO_EXTENSIONS:
         return {'ok': False, 'error': 'invalid_file_type'}, 400
 
-    upload_dir = UPLOAD_ROOT / family.family_slug
-    upload_dir.mkdir(parents=True, exist_ok=True)
-
-    safe_name = secure_filename(Path(upload.filename).stem) or 'portrait'
-    filename = f"{safe_name}_{uuid4().hex[:8]}{ext}"
-    file_path = upload_dir / filename
-    upload.save(file_path)
-
-    return {'ok': True, 'photo': f'/static/uploads/{family.family_slug}/{filename}'}
-
-
-@app.post('/api/tree/add-branch')
-def api_tree_add_branch():
+    name, created = store_photo_blob(upload.stream, ext)
+    if created:
+        photo_variant_queue.submit(PHOTO_BLOB_DIR, name)
+
+    return {'ok': True, 'photo': photo_blob_url(name)}
+
+
+TREE_BATCH_MAX_OPS = int(os.getenv('TREE_BATCH_MAX_OPS', '500'))
+
+
+class TreeEditError(Exception):
+    def __init__(self, error: str, status: int = 400):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+        self.details: dict = {}
+
+
+class TreeEditor:
+    """Applies tree editor operations to a family; the caller commits.
+
+    Only the people an operation touches are loaded. People added earlier in
+    the same editor can be addressed by the ``ref`` the client gave them.
+    Photos that stopped being referenced are collected in
+    ``released_photos`` for garbage collection after commit.
+    """
+
+    def __init__(self, family: FamilyProfile):
+        self.family = family
+        self.people: dict[str, Person] = {}
+        self.refs: dict[str, str] = {}
+        self.released_photos: set[str] = set()
+
+    def person(self, person_id, error: str = 'person_not_found') -> Person:
+        person_id = str(person_id or '').strip()
+        public_id = self.refs.get(person_id, person_id)
+        person = self.people.get(public_id)
+        if person is None and public_id:
+            person = Person.query.filter_by(family_id=self.family.id, public_id=public_id).first()
+        if person is None:
+            raise TreeEditError(error, 404)
+        self.people[public_id] = person
+        return person
+
+    def _link(self, relationship_type: str, person_a: Person, person_b: Person) -> None:
+        if relationship_type == 'parent':
+            if creates_ancestry_cycle(self.family.id, person_a.id, person_b.id):
+                raise TreeEditError('relationship_cycle', 409)
+            index_parent_link(self.family.id, person_a.id, person_b.id)
+        db.session.add(FamilyRelationship(family=self.family, relationship_type=relationship_type, person_a=person_a, person_b=person_b))
+
+    def add(self, payload: dict) -> Person:
+        parent_id = str(payload.get('parent_id') or '').strip()
+        relationship = str(payload.get('relationship') or 'child').strip().lower()
+        name = str(payload.get('name') or '').strip()
+        if relationship not in {'child', 'spouse', 'parent'}:
+            relationship = 'child'
+        if not parent_id or not name:
+            raise TreeEditError('missing_required_fields')
+        anchor = self.person(parent_id, 'anchor_not_found')
+
+        new_person = Person(
+            family=self.family,
+            public_id=unique_person_public_id(name),
+            name=name,
+            born=str(payload.get('born') or '').strip(),
+            died=str(payload.get('died') or '').strip(),
+            photo=_normalize_photo_path(str(payload.get('photo') or '').strip(), self.family.family_slug),
+        )
+        db.session.add(new_person)
+        db.session.flush()
+        apply_person_migrations(new_person, payload.get('migrations'))
+        self.people[new_person.public_id] = new_person
+        ref = str(payload.get('ref') or '').strip()
+        if ref:
+            self.refs[ref] = new_person.public_id
+
+        if relationship == 'spouse':
+            self._link('spouse', anchor, new_person)
+        elif relationship == 'parent':
+            self._link('parent', new_person, anchor)
+        else:
+            self._link('parent', anchor, new_person)
+            spouse_ids = set(db.session.scalars(
+                db.select(case((FamilyRelationship.person_a_id == anchor.id, FamilyRelationship.person_b_id), else_=FamilyRelationship.person_a_id))
+                .where(
+                    FamilyRelationship.family_id == self.family.id,
+                    FamilyRelationship.relationship_type == 'spouse',
+                    or_(FamilyRelationship.person_a_id == anchor.id, FamilyRelationship.person_b_id == anchor.id),
+                )
+            ))
+            spouse_ids.discard(anchor.id)
+            if len(spouse_ids) == 1:
+                self._link('parent', db.session.get(Person, spouse_ids.pop()), new_person)
+        return new_person
+
+    def update(self, payload: dict) -> Person:
+        if not str(payload.get('person_id') or '').strip():
+            raise TreeEditError('person_required')
+        person = self.person(payload.get('person_id'))
+        name = str(payload.get('name') or '').strip()
+        if name:
+            person.name = name
+        person.born = str(payload.get('born') or '').strip()
+        person.died = str(payload.get('died') or '').strip()
+
+        photo_value = str(payload.get('photo') or '').strip()
+        if photo_value:
+            previous_photo = person.photo
+            person.photo = _normalize_photo_path(photo_value, self.family.family_slug)
+            if previous_photo != person.photo:
+                self.released_photos.add(previous_photo)
+        apply_person_migrations(person, payload.get('migrations'))
+        return person
+
+    def delete(self, payload: dict) -> list[str]:
+        """Remove the person and everyone descended from them."""
+        if not str(payload.get('person_id') or '').strip():
+            raise TreeEditError('person_required')
+        target = self.person(payload.get('person_id'))
+
+        # Descendants via parent links, walked in the database; UNION stops on cycles.
+        subtree = db.select(Person.id).where(Person.id == target.id).cte('subtree', recursive=True)
+        subtree = subtree.union(
+            db.select(FamilyRelationship.person_b_id)
+            .join(subtree, FamilyRelationship.person_a_id == subtree.c.id)
+            .where(FamilyRelationship.family_id == self.family.id, FamilyRelationship.relationship_type == 'parent')
+        )
+        removed = db.session.execute(
+            db.select(Person.id, Person.public_id, Person.photo).where(Person.id.in_(db.select(subtree.c.id)))
+        ).all()
+        _delete_people(self.family, [row.id for row in removed])
+
+        # The rows are gone; drop their objects so later ops in this editor never see them.
+        for row in removed:
+            self.people.pop(row.public_id, None)
+            person = db.session.identity_map.get(db.session.identity_key(Person, row.id))
+            if person is not None:
+                db.session.expunge(person)
+            self.released_photos.add(row.photo)
+        db.session.expire(self.family, ['people', 'relationships'])
+        return sorted(row.public_id for row in removed)
+
+    def relate(self, payload: dict) -> None:
+        relationship_type = str(payload.get('type') or '').strip().lower()
+        if relationship_type not in {'spouse', 'parent'}:
+            raise TreeEditError('unsupported_relationship')
+        person_a = self.person(payload.get('a'))
+        person_b = self.person(payload.get('b'))
+        if person_a is person_b:
+            raise TreeEditError('self_relationship')
+        pairs = [(person_a.id, person_b.id)]
+        if relationship_type == 'spouse':
+            pairs.append((person_b.id, person_a.id))
+        existing = db.session.query(FamilyRelationship.id).filter(
+            FamilyRelationship.family_id == self.family.id,
+            FamilyRelationship.relationship_type == relationship_type,
+            or_(*(and_(FamilyRelationship.person_a_id == a, FamilyRelationship.person_b_id == b) for a, b in pairs)),
+        ).first()
+        if existing is None:
+            self._link(relationship_type, person_a, person_b)
+
+    def apply(self, operation: dict) -> dict:
+        if not isinstance(operation, dict):
+            raise TreeEditError('invalid_operation')
+        kind = operation.get('op')
+        if kind == 'add':
+            person = self.add(operation)
+            return {'op': kind, 'id': person.public_id, 'ref': operation.get('ref')}
+        if kind == 'update':
+            return {'op': kind, 'id': self.update(operation).public_id}
+        if kind == 'delete':
+            return {'op': kind, 'removed_ids': self.delete(operation)}
+        if kind == 'relate':
+            self.relate(operation)
+            return {'op': kind}
+        raise TreeEditError('unsupported_operation')
+
+
+def tree_edit_response(apply):
+    """Run ``apply(editor)`` for the logged-in user's family and commit once."""
     user = current_user()
     if not user:
         return {'ok': False, 'error': 'login_required'}, 401
-
-    payload = request.get_json(silent=True) or {}
-    parent_id = str(payload.get('parent_id') or '').strip()
-    relationship = str(payload.get('relationship') or 'child').strip().lower()
-    name = str(payload.get('name') or '').strip()
-    born = str(payload.get('born') or '').strip()
-    died = str(payload.get('died') or '').strip()
-
-    if relationship not in {'child', 'spouse', 'parent'}:
-        relationship = 'child'
-    if not parent_id or not name:
-        return {'ok': False, 'error': 'missing_required_fields'}, 400
-
     family = family_profile_for_user(user.username)
     if not family:
         return {'ok': False, 'error': 'family_not_found'}, 404
 
-    people_by_id = {person.public_id: person for person in family.people}
-    anchor = people_by_id.get(parent_id)
-    if not anchor:
-        return {'ok': False, 'error': 'anchor_not_found'}, 404
-
-    photo_value = _normalize_photo_path(str(payload.get('photo') or '').strip(), family.family_slug)
-    new_person = Person(
-        family=family,
-        public_id=unique_person_public_id(name),
-        name=name,
-        born=born,
-        died=died,
-        photo=photo_value,
-    )
-    db.session.add(new_person)
-    db.session.flush()
-    apply_person_migrations(new_person, payload.get('migrations'))
-
-    if relationship == 'spouse':
-        db.session.add(FamilyRelationship(family=family, relationship_type='spouse', person_a=anchor, person_b=new_person))
-    elif relationship == 'parent':
-        db.session.add(FamilyRelationship(family=family, relationship_type='parent', person_a=new_person, person_b=anchor))
-    else:
-        db.session.add(FamilyRelationship(family=family, relationship_type='parent', person_a=anchor, person_b=new_person))
-        spouse_links = [
-            rel for rel in family.relationships
-            if rel.relationship_type == 'spouse'
-            and ((rel.person_a_id == anchor.id) or (rel.person_b_id == anchor.id))
-        ]
-        spouse_people = []
-        for rel in spouse_links:
-            spouse = rel.person_b if rel.person_a_id == anchor.id else rel.person_a
-            if spouse and spouse.id != anchor.id:
-                spouse_people.append(spouse)
-        unique_spouses = []
-        seen_spouse_ids = set()
-        for spouse in spouse_people:
-            if spouse.id in seen_spouse_ids:
-                continue
-            seen_spouse_ids.add(spouse.id)
-            unique_spouses.append(spouse)
-        if len(unique_spouses) == 1:
-            db.session.add(FamilyRelationship(family=family, relationship_type='parent', person_a=unique_spouses[0], person_b=new_person))
+    def run() -> tuple[TreeEditor, dict]:
+        # A fresh editor per attempt: a public id conflict rolls back everything apply() did.
+        editor = TreeEditor(family)
+        result = apply(editor)
+        bump_family_revision(family)
+        db.session.commit()
+        return editor, result
 
     try:
-        db.session.commit()
+        editor, result = retry_on_conflict(run)
+    except TreeEditError as exc:
+        db.session.rollback()
+        return {'ok': False, 'error': exc.error, **exc.details}, exc.status
     except Exception as exc:
         db.session.rollback()
-        app.logger.exception('Tree add branch failed')
+        app.logger.exception('Tree edit failed')
         return {'ok': False, 'error': str(exc)}, 500
-    return {'ok': True, 'added_person_id': new_person.public_id}
+    collect_photo_blobs(editor.released_photos)
+    return {'ok': True, **result}
+
+
+@app.post('/api/tree/add-branch')
+def api_tree_add_branch():
+    payload = request.get_json(silent=True) or {}
+    return tree_edit_response(lambda editor: {'added_person_id': editor.add(payload).public_id})
 
 
 @app.post('/api/tree/update-node')
 def api_tree_update_node():
-    user = current_user()
-    if not user:
-        return {'ok': False, 'error': 'login_required'}, 401
+    payload = request.get_json(silent=True) or {}
+
+    def apply(editor: TreeEditor) -> dict:
+        editor.update(payload)
+        return {}
+
+    return tree_edit_response(apply)
+
 
+@app.post('/api/tree/delete-node')
+def api_tree_delete_node():
     payload = request.get_json(silent=True) or {}
-    person_id = str(payload.get('person_id') or '').strip()
-    if not person_id:
-        return {'ok': False, 'error': 'person_required'}, 400
+    return tree_edit_response(lambda editor: {'removed_ids': editor.delete(payload)})
 
-    family = family_profile_for_user(user.username)
-    if not family:
-        return {'ok': False, 'error': 'family_not_found'}, 404
 
-    person = next((item for item in family.people if item.public_id == person_id), None)
-    if not person:
-        return {'ok': False, 'error': 'person_not_found'}, 404
+@app.post('/api/tree/batch')
+def api_tree_batch():
+    """Apply an ordered list of add/update/delete/relate operations in one transaction.
 
-    name = str(payload.get('name') or '').strip()
-    if name:
-        person.name = name
-    person.born = str(payload.get('born') or '').strip()
-    person.died = str(payload.get('died') or '').strip()
+    Returns a result per operation, the ids assigned to client ``ref``s and,
+    unless ``"payload": false``, the refreshed tree payload.
+    """
+    payload = request.get_json(silent=True) or {}
+    operations = payload.get('ops')
+    if not isinstance(operations, list) or not operations:
+        return {'ok': False, 'error': 'ops_required'}, 400
+    if len(operations) > TREE_BATCH_MAX_OPS:
+        return {'ok': False, 'error': 'too_many_ops', 'max_ops': TREE_BATCH_MAX_OPS}, 400
+
+    def apply(editor: TreeEditor) -> dict:
+        results = []
+        for index, operation in enumerate(operations):
+            try:
+                results.append(editor.apply(operation))
+            except TreeEditError as exc:
+                exc.details = {'op_index': index}
+                raise
+        return {'results': results, 'ids': editor.refs}
+
+    response = tree_edit_response(apply)
+    if isinstance(response, dict) and payload.get('payload', True) is not False:
+        family = current_family_payload()
+        response['tree'] = normalize_tree_payload(family, family.get('meta', {}).get('family_id'))
+    return response
+
+
+GEDCOM_LINE = re.compile(r'^(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$')
+# Events whose places become a person's migration stops, in file order after the birth place.
+GEDCOM_PLACE_EVENTS = ('BIRT', 'RESI', 'EMIG', 'IMMI')
+GEDCOM_MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+GEDCOM_DATE = re.compile(r'^(?:(\d{1,2})\s+)?(?:([A-Z]{3})\s+)?(\d{3,4})$')
+
+
+def gedcom_date_to_text(value: str) -> str:
+    """Exact GEDCOM dates become ``YYYY[-MM[-DD]]``; anything else (ABT, BET ...) keeps just its year."""
+    value = value.strip().upper()
+    match = GEDCOM_DATE.match(value)
+    if match and (match[2] is None or match[2] in GEDCOM_MONTHS) and not (match[1] and not match[2]):
+        year = match[3].zfill(4)
+        if not match[2]:
+            return year
+        month = f'{GEDCOM_MONTHS.index(match[2]) + 1:02d}'
+        return f'{year}-{month}-{int(match[1]):02d}' if match[1] else f'{year}-{month}'
+    year = re.search(r'\b(\d{3,4})\b', value)
+    return year[1] if year else ''
+
+
+def text_to_gedcom_date(value: str) -> str:
+    match = re.match(r'^(\d{4})(?:-(\d{2})(?:-(\d{2}))?)?$', value.strip())
+    if not match or (match[2] and not 1 <= int(match[2]) <= 12):
+        return _gedcom_text(value)
+    parts = [str(int(match[3]))] if match[3] else []
+    if match[2]:
+        parts.append(GEDCOM_MONTHS[int(match[2]) - 1])
+    return ' '.join(parts + [match[1]])
+
+
+def iter_gedcom_records(lines) -> Iterator[tuple[str | None, str, list[tuple[int, str, str]]]]:
+    """Yield ``(xref, tag, [(level, tag, value), ...])`` per level-0 record without reading the whole file."""
+    xref, tag, body = None, None, []
+    for raw in lines:
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', errors='replace')
+        match = GEDCOM_LINE.match(raw.strip('\ufeff \t\r\n'))
+        if not match:
+            continue
+        level, line_tag, value = int(match[1]), match[3], (match[4] or '').replace('@@', '@')
+        if level == 0:
+            if tag is not None:
+                yield xref, tag, body
+            xref, tag, body = match[2], line_tag, []
+        elif line_tag in ('CONC', 'CONT') and body:
+            prev_level, prev_tag, prev_value = body[-1]
+            body[-1] = (prev_level, prev_tag, prev_value + ('\n' if line_tag == 'CONT' else '') + value)
+        else:
+            body.append((level, line_tag, value))
+    if tag is not None:
+        yield xref, tag, body
 
-    photo_value = str(payload.get('photo') or '').strip()
-    person.photo = _normalize_photo_path(photo_value, family.family_slug) if photo_value else person.photo
-    apply_person_migrations(person, payload.get('migrations'))
 
-    db.session.commit()
-    return {'ok': True}
+def _gedcom_coordinate(value: str) -> float | None:
+    value = value.strip().upper()
+    sign = -1 if value[:1] in ('S', 'W') else 1
+    try:
+        return sign * float(value.lstrip('NSEW+'))
+    except ValueError:
+        return None
 
 
-@app.post('/api/tree/delete-node')
-def api_tree_delete_node():
-    user = current_user()
-    if not user:
-        return {'ok': False, 'error': 'login_required'}, 401
+def _gedcom_person(body: list[tuple[int, str, str]]) -> dict:
+    name = ''
+    given = surname = ''
+    years: dict[str, str] = {}
+    places: list[dict] = []
+    event = None
+    place: dict | None = None
+    for level, tag, value in body:
+        if level == 1:
+            event, place = tag, None
+            if tag == 'NAME' and not name:
+                name = ' '.join(value.replace('/', ' ').split())
+        elif event == 'NAME' and level == 2:
+            if tag == 'GIVN':
+                given = given or value.strip()
+            elif tag == 'SURN':
+                surname = surname or value.strip()
+        elif level == 2 and tag == 'DATE' and event in ('BIRT', 'DEAT') and event not in years:
+            years[event] = gedcom_date_to_text(value)
+        elif level == 2 and tag == 'PLAC' and event in GEDCOM_PLACE_EVENTS and value.strip():
+            place = {'label': ' '.join(value.split())[:255], 'lat': None, 'lng': None}
+            if event == 'BIRT':
+                places.insert(0, place)
+            else:
+                places.append(place)
+        elif place is not None and level == 4 and tag in ('LATI', 'LONG'):
+            place['lat' if tag == 'LATI' else 'lng'] = _gedcom_coordinate(value)
+
+    stops: list[dict] = []
+    for place in places:
+        if not stops or stops[-1]['label'] != place['label']:
+            stops.append(place)
+    return {
+        'name': (name or ' '.join(part for part in (given, surname) if part) or 'Unknown')[:160],
+        'born': years.get('BIRT', ''),
+        'died': years.get('DEAT', ''),
+        'places': stops,
+    }
 
-    payload = request.get_json(silent=True) or {}
-    person_id = str(payload.get('person_id') or '').strip()
-    if not person_id:
-        return {'ok': False, 'error': 'person_required'}, 400
 
-    family = family_profile_for_user(user.username)
-    if not family:
-        return {'ok': False, 'error': 'family_not_found'}, 404
+def _delete_people(family: FamilyProfile, person_ids: list[int]) -> None:
+    doomed = set(person_ids)
+    # Ancestry pairs that ran through a removed person to someone who stays need a rebuild.
+    orphaned_descendants = any(
+        descendant not in doomed
+        for offset in range(0, len(person_ids), 500)
+        for descendant in db.session.scalars(
+            db.select(PersonAncestry.descendant_id).where(PersonAncestry.ancestor_id.in_(person_ids[offset:offset + 500])).distinct()
+        )
+    )
+    for offset in range(0, len(person_ids), 500):
+        batch = person_ids[offset:offset + 500]
+        PersonAncestry.query.filter(
+            or_(PersonAncestry.ancestor_id.in_(batch), PersonAncestry.descendant_id.in_(batch))
+        ).delete(synchronize_session=False)
+        FamilyRelationship.query.filter(
+            FamilyRelationship.family_id == family.id,
+            or_(FamilyRelationship.person_a_id.in_(batch), FamilyRelationship.person_b_id.in_(batch)),
+        ).delete(synchronize_session=False)
+        PersonMigration.query.filter(PersonMigration.person_id.in_(batch)).delete(synchronize_session=False)
+        Person.query.filter(Person.id.in_(batch)).delete(synchronize_session=False)
+    if orphaned_descendants:
+        rebuild_family_ancestry(family.id)
+
+
+def _clear_family_tree(family: FamilyProfile) -> set[str]:
+    """Delete every person, migration and relationship of ``family``; returns the photos they used."""
+    photos = set(db.session.scalars(db.select(Person.photo).where(Person.family_id == family.id).distinct()))
+    family_people = db.select(Person.id).where(Person.family_id == family.id)
+    PersonAncestry.query.filter_by(family_id=family.id).delete(synchronize_session=False)
+    FamilyRelationship.query.filter_by(family_id=family.id).delete(synchronize_session=False)
+    PersonMigration.query.filter(PersonMigration.person_id.in_(family_people)).delete(synchronize_session=False)
+    Person.query.filter_by(family_id=family.id).delete(synchronize_session=False)
+    return photos
+
+
+def _bulk_insert_people(family_pk: int, people: list[dict]) -> tuple[list[int], int]:
+    """Insert ``people`` and their migration stops with executemany; returns the new ids and the stop count.
+
+    Each entry has ``public_id``, ``name``, ``born``, ``died``, ``photo`` and
+    ``places`` (dicts with ``label``, ``lat``, ``lng``); the last place is the
+    current location unless ``current`` says otherwise.
+    """
+    if not people:
+        return [], 0
+    rows = []
+    for person in people:
+        current = person.get('current') or (person['places'][-1] if person['places'] else {})
+        rows.append({
+            'family_id': family_pk,
+            'public_id': person['public_id'],
+            'name': person['name'],
+            'born': person['born'],
+            'died': person['died'],
+            'photo': person['photo'],
+            'current_location_label': current.get('label', ''),
+            'current_location_lat': current.get('lat'),
+            'current_location_lng': current.get('lng'),
+        })
+    # Core inserts: the ORM bulk path splices RETURNING rows back together one at a time.
+    result = db.session.execute(Person.__table__.insert().returning(Person.id, sort_by_parameter_order=True), rows)
+    person_ids = list(result.scalars())
+    migration_rows = [
+        {'person_id': person_id, 'position': position, 'label': place['label'], 'lat': place['lat'], 'lng': place['lng']}
+        for person_id, person in zip(person_ids, people)
+        for position, place in enumerate(person['places'])
+    ]
+    if migration_rows:
+        db.session.execute(PersonMigration.__table__.insert(), migration_rows)
+    return person_ids, len(migration_rows)
+
+
+def import_gedcom(family: FamilyProfile, lines, batch_size: int = 2000, progress=None, replace: bool = False) -> dict:
+    """Stream GEDCOM ``lines`` into ``family``.
+
+    Individuals and their places are bulk-inserted ``batch_size`` at a time,
+    one transaction per batch. Relationships from FAM records are inserted
+    once every individual has an id. With ``replace`` the people already in
+    the family are deleted in the final transaction, so the old tree stays
+    whole until the new one is complete. If anything fails, everything this
+    import inserted is deleted again. ``progress`` is called with a counts
+    dict after every batch.
+    """
+    family_pk = family.id
+    family_slug = family.family_slug
+    replaced = list(db.session.scalars(db.select(Person.id).where(Person.family_id == family_pk))) if replace else []
+    replaced_photos = set(db.session.scalars(
+        db.select(Person.photo).where(Person.family_id == family_pk).distinct()
+    )) if replace else set()
+    person_ids: dict[str, int] = {}
+    inserted: list[int] = []
+    links: set[tuple[str, str, str]] = set()
+    pending: list[tuple[str, dict]] = []
+    stats = {'people': 0, 'places': 0, 'relationships': 0, 'skipped_links': 0}
+
+    def report() -> None:
+        if progress:
+            progress(dict(stats))
+
+    def flush_people() -> None:
+        if not pending:
+            return
+
+        def insert_batch() -> tuple[list[int], int]:
+            public_ids = unique_person_public_ids([f'{family_slug} {xref.strip("@")}' for xref, _ in pending])
+            people = [{**person, 'public_id': public_id, 'photo': DEFAULT_PROFILE_PHOTO} for public_id, (_, person) in zip(public_ids, pending)]
+            batch = _bulk_insert_people(family_pk, people)
+            db.session.commit()
+            return batch
+
+        # Earlier batches are committed, so a conflict only re-allocates this one.
+        new_ids, places = retry_on_conflict(insert_batch)
+        for (xref, _), person_id in zip(pending, new_ids):
+            person_ids[xref] = person_id
+        inserted.extend(new_ids)
+        stats['people'] += len(pending)
+        stats['places'] += places
+        pending.clear()
+        report()
 
-    target = next((item for item in family.people if item.public_id == person_id), None)
-    if not target:
-        return {'ok': False, 'error': 'person_not_found'}, 404
+    try:
+        for xref, tag, body in iter_gedcom_records(lines):
+            if tag == 'INDI' and xref and xref not in person_ids:
+                pending.append((xref, _gedcom_person(body)))
+                if len(pending) >= batch_size:
+                    flush_people()
+            elif tag == 'FAM':
+                parents = [value for level, sub, value in body if level == 1 and sub in ('HUSB', 'WIFE')]
+                children = [value for level, sub, value in body if level == 1 and sub == 'CHIL']
+                if len(parents) == 2:
+                    links.add(('spouse', *sorted(parents)))
+                links.update(('parent', parent, child) for parent in parents for child in children if parent != child)
+        flush_people()
+
+        rows = []
+        for kind, a, b in sorted(links):
+            if a not in person_ids or b not in person_ids:
+                stats['skipped_links'] += 1
+                continue
+            rows.append({'family_id': family_pk, 'relationship_type': kind, 'person_a_id': person_ids[a], 'person_b_id': person_ids[b]})
+            if len(rows) >= batch_size:
+                db.session.execute(FamilyRelationship.__table__.insert(), rows)
+                db.session.commit()
+                stats['relationships'] += len(rows)
+                rows = []
+                report()
+        if rows:
+            db.session.execute(FamilyRelationship.__table__.insert(), rows)
+            stats['relationships'] += len(rows)
+        family = db.session.get(FamilyProfile, family_pk)
+        if replaced:
+            _delete_people(family, replaced)
+        rebuild_family_ancestry(family_pk)
+        bump_family_revision(family)
+        db.session.commit()
+        report()
+    except Exception:
+        db.session.rollback()
+        _delete_people(db.session.get(FamilyProfile, family_pk), inserted)
+        db.session.commit()
+        raise
+    collect_photo_blobs(replaced_photos)
+    return stats
 
-    child_map: dict[str, set[str]] = defaultdict(set)
-    people_by_id = {person.id: person for person in family.people}
-    for rel in family.relationships:
-        if rel.relationship_type != 'parent':
-            continue
-        if rel.person_a_id in people_by_id and rel.person_b_id in people_by_id:
-            child_map[people_by_id[rel.person_a_id].public_id].add(people_by_id[rel.person_b_id].public_id)
 
-    to_remove_public_ids = set()
-    stack = [target.public_id]
-    while stack:
-        current = stack.pop()
-        if current in to_remove_public_ids:
+def _json_coordinate(value, limit: float) -> float | None:
+    """``value`` as a latitude/longitude, None when blank; raises ValueError or TypeError when it is not one."""
+    if value in (None, ''):
+        return None
+    number = float(value)
+    if not math.isfinite(number) or abs(number) > limit:
+        raise ValueError(f'{value!r} is out of range')
+    return number
+
+
+JSON_COORDINATES = (('lat', ('lat',), 90), ('lng', ('lng', 'lon'), 180))
+
+
+def _json_place(location) -> dict | None:
+    if not isinstance(location, dict):
+        return None
+    label = str(location.get('label') or format_place(location) or '').strip()
+    if not label:
+        return None
+    place = {'label': label[:255]}
+    for key, aliases, limit in JSON_COORDINATES:
+        place[key] = _json_coordinate(next((location[alias] for alias in aliases if alias in location), None), limit)
+    return place
+
+
+def _json_place_errors(location, where: str) -> list[str]:
+    if not isinstance(location, dict):
+        return []
+    errors = []
+    for key, aliases, limit in JSON_COORDINATES:
+        value = next((location[alias] for alias in aliases if alias in location), None)
+        try:
+            _json_coordinate(value, limit)
+        except (TypeError, ValueError):
+            errors.append(f'{where} has an invalid {key} {value!r}')
+    return errors
+
+
+def _json_relationship_links(rel) -> list[tuple[str, str, str]] | None:
+    """``(type, a, b)`` rows for one data/samples relationship, or None if it is malformed."""
+    if not isinstance(rel, dict):
+        return None
+    if rel.get('type') == 'spouse':
+        a, b = rel.get('a'), rel.get('b')
+        # Stored once per couple whichever way round the file lists it.
+        return [('spouse', *sorted((str(a), str(b))))] if a and b else None
+    parent = rel.get('parentId') or rel.get('parent')
+    child = rel.get('childId') or rel.get('child')
+    if not parent or not child:
+        return None
+    links = [('parent', str(parent), str(child))]
+    other = rel.get('otherParentId')
+    if other:
+        links.append(('parent', str(other), str(child)))
+    return links
+
+
+def validate_family_json(data) -> list[str]:
+    """Problems that would stop ``data`` (data/samples format) from importing cleanly."""
+    if not isinstance(data, dict) or not isinstance(data.get('people'), list):
+        return ['expected an object with a "people" list']
+    if not data['people']:
+        return ['"people" is empty']
+    errors = []
+    seen: set[str] = set()
+    for position, person in enumerate(data['people']):
+        pid = str(person.get('id') or '').strip() if isinstance(person, dict) else ''
+        if not pid:
+            errors.append(f'people[{position}] has no id')
+        elif pid in seen:
+            errors.append(f'duplicate person id {pid!r}')
+        seen.add(pid)
+        if not isinstance(person, dict):
+            continue
+        migrations = person.get('migrations', [])
+        if not isinstance(migrations, list):
+            errors.append(f'person {pid!r} migrations must be a list')
+            migrations = []
+        for stop, location in enumerate(migrations):
+            errors += _json_place_errors(location, f'person {pid!r} migrations[{stop}]')
+        errors += _json_place_errors(person.get('current_location'), f'person {pid!r} current_location')
+    relationships = data.get('relationships', [])
+    if not isinstance(relationships, list):
+        return errors + ['"relationships" must be a list']
+    for position, rel in enumerate(relationships):
+        links = _json_relationship_links(rel)
+        if links is None:
+            errors.append(f'relationships[{position}] is malformed')
             continue
-        to_remove_public_ids.add(current)
-        stack.extend(child_map.get(current, set()))
+        for _, a, b in links:
+            missing = [pid for pid in (a, b) if pid not in seen]
+            if missing:
+                errors.append(f'relationships[{position}] references unknown person {missing[0]!r}')
+            elif a == b:
+                errors.append(f'relationships[{position}] links {a!r} to itself')
+    return errors
+
+
+def import_family_json(family: FamilyProfile, data: dict, replace: bool = False) -> dict:
+    """Load a data/samples-format family into ``family`` in a single transaction.
+
+    ``data`` is validated first and nothing is written if it has problems
+    (raises ValueError with the list). Public ids keep the file's ids where
+    they are free and are allocated in one bulk pass otherwise.
+    """
+    errors = validate_family_json(data)
+    if errors:
+        raise ValueError(errors)
+
+    def run() -> tuple[set[str], dict]:
+        photos = _clear_family_tree(family) if replace else set()
+        source_ids = [str(person['id']).strip() for person in data['people']]
+        public_ids = unique_person_public_ids(source_ids)
+        people = []
+        for public_id, person in zip(public_ids, data['people']):
+            places = [place for place in map(_json_place, person.get('migrations') or []) if place]
+            people.append({
+                'public_id': public_id,
+                'name': str(person.get('name') or 'Unknown').strip()[:160],
+                'born': str(person.get('born') or '').strip()[:32],
+                'died': str(person.get('died') or '').strip()[:32],
+                'photo': _normalize_photo_path(person.get('photo') or person.get('image'), family.family_slug)[:255],
+                'places': places,
+                'current': _json_place(person.get('current_location')),
+            })
+        new_ids, place_count = _bulk_insert_people(family.id, people)
+        by_source = dict(zip(source_ids, new_ids))
+
+        links = {link for rel in data.get('relationships', []) for link in _json_relationship_links(rel)}
+        rows = [
+            {'family_id': family.id, 'relationship_type': kind, 'person_a_id': by_source[a], 'person_b_id': by_source[b]}
+            for kind, a, b in sorted(links)
+        ]
+        if rows:
+            db.session.execute(FamilyRelationship.__table__.insert(), rows)
+        rebuild_family_ancestry(family.id)
+        bump_family_revision(family)
+        db.session.commit()
+        return photos, {'people': len(new_ids), 'places': place_count, 'relationships': len(rows)}
+
+    try:
+        photos, stats = retry_on_conflict(run)
+    except Exception:
+        db.session.rollback()
+        raise
+    collect_photo_blobs(photos)
+    return {**stats, 'skipped_events': len(data.get('events') or [])}
+
+
+def isolated_get(client, url: str):
+    # A request inside an already-pushed app context (CLI commands, warmup)
+    # would share that context's `g`, and with it the per-request caches.
+    with app.app_context():
+        return client.get(url)
+
+
+WARMUP_PATHS = (
+    '/',
+    '/tree',
+    '/api/current-family/tree',
+    '/api/current-family/tree?scope=lineage&generations=4',
+    '/api/current-family/tree/layout',
+    '/api/current-family/people',
+)
+
+
+def warm_app() -> None:
+    """Do the first-request work once in the gunicorn master, before workers fork.
+
+    Checks the schema, requests every sample family through the public
+    views so the registry, payload and layout caches are full, and compiles
+    every template. Workers then start with that state shared copy-on-write.
+    Anything that fails here is simply left to the lazy per-request path.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        try:
+            db.create_all()
+            app.config['_db_bootstrapped'] = True
+        except Exception:
+            app.logger.exception('Schema check failed during warmup')
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+
+        client = app.test_client()
+        samples = sample_family_ids()
+        for sid in samples:
+            for path in WARMUP_PATHS:
+                isolated_get(client, f'{path}{"&" if "?" in path else "?"}family={sid}')
+        # Forked workers must open their own connections.
+        db.engine.dispose()
+    # Keep the collector from touching (and so un-sharing) the warmed objects in every worker.
+    gc.freeze()
+    app.logger.info('Warmed %s sample families in %.2fs', len(samples), time.perf_counter() - started)
+
+
+SAMPLE_ARTIFACT_VIEWS = (
+    (('tree', 'full', 0), '/api/current-family/tree'),
+    (('tree', 'lineage', 4), '/api/current-family/tree?scope=lineage&generations=4'),
+    (('layout',), '/api/current-family/tree/layout'),
+    (('people',), '/api/current-family/people'),
+)
+
+
+@app.cli.command('build-sample-artifact')
+def build_sample_artifact_command() -> None:
+    """Precompute the sample families' payloads into the memory-mapped artifact."""
+    client = app.test_client()
+    year = datetime.now().year
+    samples: dict[str, dict] = {}
+    bodies: dict[str, dict[tuple, bytes]] = {}
+    for sid in sample_family_ids():
+        views = {}
+        for view_key, url in SAMPLE_ARTIFACT_VIEWS:
+            response = isolated_get(client, f'{url}{"&" if "?" in url else "?"}family={sid}')
+            if response.status_code != 200:
+                raise click.ClickException(f'{url} returned {response.status_code} for {sid}')
+            views[view_key] = response.get_data()
+        with app.app_context(), app.test_request_context(f'/?family={sid}'):
+            views[('landing', year)] = app.json.dumps(landing_summary_from_family(current_sample_family())).encode('utf-8')
+            samples[sid] = {
+                'sha1': hashlib.sha1((SAMPLES_DIR / f'{sid}.json').read_bytes()).hexdigest(),
+                'variants': repr(current_family_cache_key()[3]),
+            }
+        bodies[sid] = views
+    size = SampleArtifact.write(SAMPLE_ARTIFACT_PATH, samples, bodies)
+    click.echo(f'Wrote {len(bodies)} sample families ({size} bytes) to {SAMPLE_ARTIFACT_PATH}')
+
+
+@app.cli.command('import-gedcom')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--user', 'username', required=True, help='Owner of the family the file is imported into.')
+@click.option('--replace', is_flag=True, help='Replace the existing tree once the import has finished.')
+@click.option('--batch-size', default=2000, show_default=True, help='Individuals per transaction.')
+def import_gedcom_command(path: Path, username: str, replace: bool, batch_size: int) -> None:
+    """Import a GEDCOM file into a user's family tree."""
+    family = family_profile_for_user(username)
+    if not family:
+        raise click.ClickException(f'Unknown user {username!r}.')
+    started = time.perf_counter()
+
+    def progress(stats: dict) -> None:
+        click.echo(f'{stats["people"]:>9} people  {stats["places"]:>9} places  {stats["relationships"]:>9} relationships  {time.perf_counter() - started:7.1f}s')
 
-    to_remove_people = [person for person in family.people if person.public_id in to_remove_public_ids]
-    remove_db_ids = {person.id for person in to_remove_people}
+    with path.open('rb') as lines:
+        stats = import_gedcom(family, lines, batch_size=max(1, batch_size), progress=progress, replace=replace)
+    if stats['skipped_links']:
+        click.echo(f'Skipped {stats["skipped_links"]} family links to unknown individuals.')
 
-    FamilyRelationship.query.filter(
-        FamilyRelationship.family_id == family.id,
-        or_(FamilyRelationship.person_a_id.in_(remove_db_ids), FamilyRelationship.person_b_id.in_(remove_db_ids)),
-    ).delete(synchronize_session=False)
 
-    for person in to_remove_people:
-        db.session.delete(person)
+@app.cli.command('import-family-json')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--user', 'username', required=True, help='Owner of the family the file is imported into.')
+@click.option('--replace', is_flag=True, help='Delete the existing tree first.')
+def import_family_json_command(path: Path, username: str, replace: bool) -> None:
+    """Import a data/samples-format JSON family into a user's family tree."""
+    family = family_profile_for_user(username)
+    if not family:
+        raise click.ClickException(f'Unknown user {username!r}.')
+    try:
+        data = app.json.loads(path.read_bytes())
+    except ValueError as exc:
+        raise click.ClickException(f'Invalid JSON: {exc}')
+    errors = validate_family_json(data)
+    if errors:
+        raise click.ClickException('Invalid family file:\n  ' + '\n  '.join(errors[:20]))
+    stats = import_family_json(family, data, replace=replace)
+    click.echo(f'Imported {stats["people"]} people, {stats["places"]} places and {stats["relationships"]} relationships.')
+
+
+@app.cli.command('rebuild-ancestry')
+@click.option('--user', 'username', default=None, help='Only rebuild this user\'s family.')
+def rebuild_ancestry_command(username: str | None) -> None:
+    """Recompute the ancestry index from the stored parent links."""
+    if username:
+        family = family_profile_for_user(username)
+        if not family:
+            raise click.ClickException(f'Unknown user {username!r}.')
+        family_pks = [family.id]
+    else:
+        family_pks = list(db.session.scalars(db.select(FamilyProfile.id).order_by(FamilyProfile.id)))
+    for family_pk in family_pks:
+        started = time.perf_counter()
+        pairs = rebuild_family_ancestry(family_pk)
+        cycles = db.session.scalar(
+            db.select(func.count()).select_from(PersonAncestry)
+            .where(PersonAncestry.family_id == family_pk, PersonAncestry.ancestor_id == PersonAncestry.descendant_id)
+        )
+        db.session.commit()
+        note = f'  ({cycles} people on parent cycles)' if cycles else ''
+        click.echo(f'family {family_pk:>6}: {pairs:>9} pairs  {time.perf_counter() - started:6.2f}s{note}')
+
 
+@app.cli.command('export-family')
+@click.option('--user', 'username', required=True, help='Owner of the family to export.')
+@click.option('--format', 'export_format', type=click.Choice(sorted(FAMILY_EXPORTERS)), default='json', show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='Destination file; defaults to stdout.')
+def export_family_command(username: str, export_format: str, output) -> None:
+    """Stream a user's family tree to a JSON, NDJSON or GEDCOM file."""
+    user = get_user(username)
+    if not user or not user.family_profile:
+        raise click.ClickException(f'Unknown user {username!r}.')
+    for chunk in FAMILY_EXPORTERS[export_format][0](user.family_profile.id):
+        output.write(chunk)
+
+
+@app.cli.command('build-photo-variants')
+@click.option('--family', 'family_ids', multiple=True, help='Upload folder to process; defaults to all of them.')
+@click.option('--force', is_flag=True, help='Rebuild variants that already exist.')
+def build_photo_variants_command(family_ids: tuple[str, ...], force: bool) -> None:
+    """Generate card/avatar/full WebP variants for photos already in static/uploads."""
+    if Image is None:
+        raise click.ClickException('Pillow is not installed.')
+    folders = [UPLOAD_ROOT / fid for fid in family_ids] or sorted(path for path in UPLOAD_ROOT.iterdir() if path.is_dir())
+    jobs = []
+    for folder in folders:
+        for source in sorted(folder.iterdir()) if folder.is_dir() else []:
+            if source.suffix.lower() not in PHOTO_EXTENSIONS:
+                continue
+            target = folder / PHOTO_VARIANT_DIR
+            built = [target / photo_variant_name(source.name, variant) for variant in PHOTO_VARIANTS]
+            if force or not all(path.exists() and path.stat().st_mtime >= source.stat().st_mtime for path in built):
+                jobs.append((str(source), str(target)))
+    with ProcessPoolExecutor(max_workers=max(1, photo_variant_queue.workers)) as pool:
+        written = sum(len(names) for names in pool.map(render_photo_variants, *zip(*jobs))) if jobs else 0
+    upload_manifest.clear()
+    click.echo(f'Built {written} variants for {len(jobs)} photos.')
+
+
+@app.cli.command('migrate-photo-blobs')
+@click.option('--prune', is_flag=True, help='Delete the per-family originals once nothing points at them.')
+def migrate_photo_blobs_command(prune: bool) -> None:
+    """Move photos that people and profiles reference into the shared blob store."""
+    blobs: dict[str, str] = {}
+
+    def blob_for(url: str) -> str | None:
+        if url in blobs:
+            return blobs[url]
+        blobs[url] = None
+        relative = url[len('/static/uploads/'):] if url.startswith('/static/uploads/') else ''
+        path = UPLOAD_ROOT / relative
+        if relative.startswith(f'{PHOTO_BLOB_DIR}/') or '..' in relative or not path.is_file() or path.suffix.lower() not in PHOTO_EXTENSIONS:
+            return None
+        with path.open('rb') as stream:
+            name, created = store_photo_blob(stream, path.suffix.lower())
+        if created:
+            photo_variant_queue.submit(PHOTO_BLOB_DIR, name)
+        blobs[url] = photo_blob_url(name)
+        return blobs[url]
+
+    changed_families: set[int] = set()
+    for model, column in ((Person, 'photo'), (FamilyProfile, 'profile_photo')):
+        for row in model.query.filter(getattr(model, column).like('/static/uploads/%')).yield_per(500):
+            blob = blob_for(getattr(row, column))
+            if blob:
+                setattr(row, column, blob)
+                changed_families.add(row.family_id if model is Person else row.id)
+    for family in FamilyProfile.query.filter(FamilyProfile.id.in_(changed_families)):
+        bump_family_revision(family)
     db.session.commit()
-    return {'ok': True, 'removed_ids': sorted(to_remove_public_ids)}
+
+    pruned = 0
+    if prune:
+        samples = set(sample_family_ids())
+        moved = [url for url, blob in blobs.items() if blob]
+        counts = photo_blob_refcounts(moved)
+        for url in moved:
+            folder = url[len('/static/uploads/'):].partition('/')[0]
+            if counts[url] or folder in samples:
+                continue
+            (UPLOAD_ROOT / url[len('/static/uploads/'):]).unlink(missing_ok=True)
+            pruned += 1
+        upload_manifest.clear()
+    stored = len(set(blob for blob in blobs.values() if blob))
+    click.echo(f'Moved {sum(1 for blob in blobs.values() if blob)} photos into {stored} blobs for {len(changed_families)} families; pruned {pruned} originals.')
+
+
+@app.cli.command('gc-photo-blobs')
+def gc_photo_blobs_command() -> None:
+    """Delete stored photo blobs that no person or profile references."""
+    folder = UPLOAD_ROOT / PHOTO_BLOB_DIR
+    urls = [photo_blob_url(path.name) for path in folder.iterdir() if path.is_file() and not path.name.startswith('.')] if folder.is_dir() else []
+    removed = collect_photo_blobs(urls)
+    click.echo(f'Removed {len(removed)} of {len(urls)} blobs.')
 
 
 if __name__ == '__main__':
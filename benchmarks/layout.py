@@ -0,0 +1,28 @@
+"""Time build_tree_layout on generated families.
+
+Run from the project root::
+
+    python -m benchmarks.layout --sizes 1000,10000,50000
+"""
+from __future__ import annotations
+
+import timeit
+
+import click
+
+from app import build_tree_layout
+from benchmarks.synthetic import synthetic_family
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000,50000', show_default=True, help='Comma-separated family sizes.')
+@click.option('--repeat', default=3, show_default=True, help='Runs per size; the best time is reported.')
+def main(sizes: str, repeat: int) -> None:
+    for size in [int(part) for part in sizes.split(',') if part.strip()]:
+        data = synthetic_family(size)
+        best = min(timeit.repeat(lambda: build_tree_layout(data), number=1, repeat=max(1, repeat)))
+        click.echo(f'{size:>8} people  {best * 1000:9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Time the enrich -> normalize -> serialize pipeline behind /api/current-family/tree.
+
+Run from the project root::
+
+    python -m benchmarks.payload --sizes 1000,10000,50000
+"""
+from __future__ import annotations
+
+import timeit
+
+import click
+
+from app import _compact_json, enrich_family_data, locked_root_person_ids, normalize_tree_payload, orjson
+from benchmarks.synthetic import synthetic_family
+
+
+@click.command()
+@click.option('--sizes', default='1000,10000,50000', show_default=True, help='Comma-separated family sizes.')
+@click.option('--repeat', default=3, show_default=True, help='Runs per size; the best time is reported.')
+def main(sizes: str, repeat: int) -> None:
+    click.echo(f'json backend: {"orjson" if orjson is not None else "stdlib"}')
+    for size in [int(part) for part in sizes.split(',') if part.strip()]:
+        data = synthetic_family(size)
+        enriched = enrich_family_data(data, 'synthetic')
+        locked_ids = locked_root_person_ids(enriched)
+        tree = normalize_tree_payload(enriched, 'synthetic', locked_ids)
+        stages = {
+            'enrich': lambda: enrich_family_data(data, 'synthetic'),
+            'normalize': lambda: normalize_tree_payload(enriched, 'synthetic', locked_ids),
+            'serialize': lambda: _compact_json(tree),
+            'total': lambda: _compact_json(normalize_tree_payload(enrich_family_data(data, 'synthetic'), 'synthetic', locked_ids)),
+        }
+        timings = '  '.join(
+            f'{name} {min(timeit.repeat(stage, number=1, repeat=max(1, repeat))) * 1000:8.1f} ms'
+            for name, stage in stages.items()
+        )
+        click.echo(f'{size:>8} people  {timings}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Generated families for the benchmarks and tests."""
+from __future__ import annotations
+
+import random
+
+from app import DEFAULT_SEED_LOCATION
+
+
+def synthetic_family(size: int, seed: int = 7) -> dict:
+    """Generate a married-couples-with-children family of ``size`` people for benchmarks and tests."""
+    rng = random.Random(seed)
+    people: list[dict] = []
+    relationships: list[dict] = []
+    places = [
+        {'city': 'Rome', 'country': 'Italy', 'lat': 41.9, 'lng': 12.5},
+        {'city': 'Dublin', 'country': 'Ireland', 'lat': 53.35, 'lng': -6.26},
+        {'city': 'Boston', 'region': 'Massachusetts', 'country': 'USA', 'lat': 42.36, 'lng': -71.06},
+        DEFAULT_SEED_LOCATION,
+    ]
+
+    def add_person(born: int) -> str:
+        pid = f'person_{len(people)}'
+        route = rng.sample(places, rng.randint(1, 3))
+        people.append({
+            'id': pid, 'name': f'Person {len(people)}', 'born': str(born), 'died': '', 'photo': '',
+            'migrations': route[:-1], 'current_location': route[-1],
+        })
+        return pid
+
+    founder = add_person(1700)
+    founder_spouse = add_person(1702)
+    relationships.append({'type': 'spouse', 'a': founder, 'b': founder_spouse})
+    couples = [(founder, founder_spouse, 1700)]
+    while len(people) < size:
+        next_couples = []
+        for parent_a, parent_b, born in couples:
+            for _ in range(rng.randint(1, 4)):
+                if len(people) >= size:
+                    break
+                child = add_person(born + 25 + rng.randint(0, 10))
+                relationships.append({'parent': parent_a, 'child': child})
+                relationships.append({'parent': parent_b, 'child': child})
+                if len(people) < size and rng.random() < 0.7:
+                    spouse = add_person(born + 25 + rng.randint(0, 10))
+                    relationships.append({'type': 'spouse', 'a': child, 'b': spouse})
+                    next_couples.append((child, spouse, born + 30))
+        couples = next_couples or couples
+    return {
+        'meta': {'family_id': 'synthetic', 'family_name': 'Synthetic Family'},
+        'people': people,
+        'relationships': relationships,
+        'events': [],
+    }
@@ -0,0 +1,8 @@
+# Loaded automatically by `gunicorn app:app` from the project directory.
+preload_app = True
+
+
+def on_starting(server):
+    from app import warm_app
+
+    warm_app()
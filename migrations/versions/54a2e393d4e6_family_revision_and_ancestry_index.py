@@ -0,0 +1,80 @@
+"""family revision and ancestry index
+
+Revision ID: 54a2e393d4e6
+Revises: e4187d3299ec
+Create Date: 2026-10-17 04:27:32.176124
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '54a2e393d4e6'
+down_revision = 'e4187d3299ec'
+branch_labels = None
+depends_on = None
+
+
+# Closure of every family's parent links; UNION keeps the walk finite on cyclic data.
+BACKFILL_ANCESTRY = '''
+INSERT INTO person_ancestry (family_id, ancestor_id, descendant_id)
+WITH RECURSIVE closure (family_id, ancestor_id, descendant_id) AS (
+    SELECT family_id, person_a_id, person_b_id
+    FROM family_relationships
+    WHERE relationship_type = 'parent'
+    UNION
+    SELECT closure.family_id, closure.ancestor_id, link.person_b_id
+    FROM closure
+    JOIN family_relationships AS link
+        ON link.person_a_id = closure.descendant_id AND link.relationship_type = 'parent'
+)
+SELECT family_id, ancestor_id, descendant_id FROM closure
+'''
+
+
+def upgrade():
+    # The app's create_all() may already have made the table on a deploy that started before this ran.
+    if context.is_offline_mode() or not sa.inspect(op.get_bind()).has_table('person_ancestry'):
+        op.create_table('person_ancestry',
+        sa.Column('family_id', sa.Integer(), nullable=False),
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['people.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['people.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['family_id'], ['family_profiles.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+        )
+        with op.batch_alter_table('person_ancestry', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_person_ancestry_descendant_id'), ['descendant_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_person_ancestry_family_id'), ['family_id'], unique=False)
+    op.execute('DELETE FROM person_ancestry')
+    op.execute(BACKFILL_ANCESTRY)
+
+    with op.batch_alter_table('family_profiles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('family_relationships', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_family_relationships_person_a_id'), ['person_a_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_family_relationships_person_b_id'), ['person_b_id'], unique=False)
+
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.create_index('ix_people_public_id_pattern', ['public_id'], unique=False, postgresql_ops={'public_id': 'text_pattern_ops'})
+
+
+def downgrade():
+    with op.batch_alter_table('people', schema=None) as batch_op:
+        batch_op.drop_index('ix_people_public_id_pattern', postgresql_ops={'public_id': 'text_pattern_ops'})
+
+    with op.batch_alter_table('family_relationships', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_family_relationships_person_b_id'))
+        batch_op.drop_index(batch_op.f('ix_family_relationships_person_a_id'))
+
+    with op.batch_alter_table('family_profiles', schema=None) as batch_op:
+        batch_op.drop_column('revision')
+
+    with op.batch_alter_table('person_ancestry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_person_ancestry_family_id'))
+        batch_op.drop_index(batch_op.f('ix_person_ancestry_descendant_id'))
+
+    op.drop_table('person_ancestry')
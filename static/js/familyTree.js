@@ -34,7 +34,7 @@ function clamp(v, min, max) {
 
 function cardImageHref(person) {
   const raw = person?.raw || {};
-  return raw.photo || raw.image || raw.avatar || "/static/img/placeholder-avatar.png";
+  return raw.image || raw.photo || raw.avatar || "/static/img/placeholder-avatar.png";
 }
 
 function wrapName(text, width) {
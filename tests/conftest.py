@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+# app reads DATABASE_URL at import time; point it at a throwaway SQLite file.
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='lineagemap-tests-'), 'test.db')
+
+import pytest
+
+import app as app_module
+from app import app as flask_app, db
+
+
+@pytest.fixture
+def schema():
+    with flask_app.app_context():
+        db.create_all()
+    yield
+    # Family ids restart with the schema, so process-wide caches would serve stale bodies.
+    for cache in (app_module.payload_cache, app_module.layout_rows_cache, app_module.layout_index_cache, app_module.kinship_index_cache, app_module.family_blobs_cache):
+        cache.clear()
+    with flask_app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def app(schema):
+    with flask_app.app_context():
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(schema):
+    # Requests get their own app context (and `g`); don't combine with the `app` fixture.
+    return flask_app.test_client()
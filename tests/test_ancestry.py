@@ -0,0 +1,100 @@
+import pytest
+
+from app import FamilyRelationship, Person, PersonAncestry, app, db
+
+
+FAMILY = {
+    'meta': {'family_name': 'Lines'},
+    'people': [
+        {'id': 'ann', 'name': 'Ann'},
+        {'id': 'bob', 'name': 'Bob'},
+        {'id': 'cat', 'name': 'Cat'},
+        {'id': 'dan', 'name': 'Dan'},
+        {'id': 'eve', 'name': 'Eve'},
+    ],
+    'relationships': [
+        {'parent': 'ann', 'child': 'bob'},
+        {'parent': 'bob', 'child': 'cat'},
+        {'parent': 'cat', 'child': 'dan'},
+        {'parent': 'ann', 'child': 'eve'},
+    ],
+    'events': [],
+}
+
+
+@pytest.fixture
+def member(client):
+    client.post('/register', data={'username': 'keeper', 'password': 'pw', 'profile_name': 'Keeper'})
+    assert client.post('/api/current-family/import?replace=1', json=FAMILY).status_code == 200
+    return client
+
+
+def ids(client) -> dict[str, str]:
+    family = client.get('/api/current-family/export?format=json').get_json()
+    return {person['name']: person['id'] for person in family['people']}
+
+
+def ancestry_pairs() -> set[tuple[str, str]]:
+    with app.app_context():
+        names = dict(db.session.execute(db.select(Person.id, Person.name)).all())
+        return {(names[a], names[d]) for a, d in db.session.execute(db.select(PersonAncestry.ancestor_id, PersonAncestry.descendant_id))}
+
+
+def parent_link_count() -> int:
+    with app.app_context():
+        return FamilyRelationship.query.filter_by(relationship_type='parent').count()
+
+
+LINES = {
+    ('Ann', 'Bob'), ('Ann', 'Cat'), ('Ann', 'Dan'), ('Ann', 'Eve'),
+    ('Bob', 'Cat'), ('Bob', 'Dan'), ('Cat', 'Dan'),
+}
+
+
+def test_batch_relate_rejects_a_cycle(member):
+    people = ids(member)
+    response = member.post('/api/tree/batch', json={'payload': False, 'ops': [
+        {'op': 'relate', 'type': 'parent', 'a': people['Eve'], 'b': people['Dan']},
+        {'op': 'relate', 'type': 'parent', 'a': people['Dan'], 'b': people['Bob']},
+    ]})
+    assert response.status_code == 409
+    assert response.get_json() == {'ok': False, 'error': 'relationship_cycle', 'op_index': 1}
+    assert parent_link_count() == 4
+    assert ancestry_pairs() == LINES
+
+
+def test_relationships_add_rejects_a_cycle(member):
+    people = ids(member)
+    member.post('/relationships/add', data={'relationship_type': 'parent-child', 'first_person': people['Dan'], 'second_person': people['Ann']})
+    with member.session_transaction() as session:
+        assert session['_flashes'][-1] == ('message', 'That connection would make someone their own ancestor.')
+    assert parent_link_count() == 4
+    assert ancestry_pairs() == LINES
+
+
+def test_subtree_delete_keeps_the_index_in_step(member):
+    people = ids(member)
+    assert member.post('/api/tree/batch', json={'payload': False, 'ops': [
+        {'op': 'relate', 'type': 'parent', 'a': people['Eve'], 'b': people['Dan']},
+    ]}).status_code == 200
+    assert ancestry_pairs() == LINES | {('Eve', 'Dan')}
+
+    assert member.post('/api/tree/delete-node', json={'person_id': people['Bob']}).get_json()['ok']
+    assert ancestry_pairs() == {('Ann', 'Eve')}
+
+
+def test_missing_index_is_rebuilt_before_the_cycle_check(member):
+    # Families whose parent links pre-date the index have no rows at all.
+    with app.app_context():
+        PersonAncestry.query.delete()
+        db.session.commit()
+    people = ids(member)
+    response = member.post('/api/tree/batch', json={'payload': False, 'ops': [
+        {'op': 'relate', 'type': 'parent', 'a': people['Dan'], 'b': people['Ann']},
+    ]})
+    assert response.get_json()['error'] == 'relationship_cycle'
+
+    assert member.post('/api/tree/batch', json={'payload': False, 'ops': [
+        {'op': 'relate', 'type': 'parent', 'a': people['Eve'], 'b': people['Cat']},
+    ]}).status_code == 200
+    assert ancestry_pairs() == LINES | {('Eve', 'Cat'), ('Eve', 'Dan')}
@@ -0,0 +1,43 @@
+from sqlalchemy import event
+
+from app import FamilyProfile, FamilyRelationship, Person, PersonMigration, User, db, family_to_payload
+
+
+def make_family(username: str, size: int) -> int:
+    user = User(username=username, display_name=username, password_hash='x')
+    family = FamilyProfile(user=user, family_slug=username, family_name=username, profile_name=username)
+    people = []
+    for i in range(size):
+        person = Person(family=family, public_id=f'{username}_{i}', name=f'Person {i}', born=str(1900 + i % 100))
+        person.migrations = [PersonMigration(position=0, label='Dublin', lat=53.35, lng=-6.26), PersonMigration(position=1, label='Boston', lat=42.36, lng=-71.06)]
+        people.append(person)
+    db.session.add_all([user, family, *people])
+    for i in range(1, size):
+        db.session.add(FamilyRelationship(family=family, relationship_type='parent', person_a=people[(i - 1) // 2], person_b=people[i]))
+        if i % 2:
+            db.session.add(FamilyRelationship(family=family, relationship_type='spouse', person_a=people[i], person_b=people[i + 1 if i + 1 < size else 0]))
+    db.session.commit()
+    return family.id
+
+
+def count_payload_queries(family_id: int) -> tuple[int, int]:
+    db.session.expire_all()
+    family = db.session.get(FamilyProfile, family_id)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        payload = family_to_payload(family)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return len(payload['people']), len(statements)
+
+
+def test_family_payload_query_count_does_not_grow_with_size(app):
+    small = count_payload_queries(make_family('small', 10))
+    large = count_payload_queries(make_family('large', 1000))
+    assert (small[0], large[0]) == (10, 1000)
+    assert small[1] == large[1]
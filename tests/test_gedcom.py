@@ -0,0 +1,80 @@
+import app as app_module
+from app import app
+
+
+FAMILY = {
+    'meta': {'family_name': 'Export'},
+    'people': [
+        {'id': 'mum', 'name': 'Ann @Home Smith', 'born': '1950', 'current_location': {'label': 'Flat 2 @ Mill Lane', 'lat': 51.5, 'lng': -0.1}},
+        {'id': 'dad', 'name': 'Bob Smith', 'born': '1948'},
+        {'id': 'step', 'name': 'Carl Jones', 'born': '1952'},
+        {'id': 'kid', 'name': 'Dora Smith', 'born': '1980'},
+    ],
+    'relationships': [
+        {'type': 'spouse', 'a': 'mum', 'b': 'dad'},
+        {'parent': 'mum', 'child': 'kid'},
+        {'parent': 'dad', 'child': 'kid'},
+        {'parent': 'step', 'child': 'kid'},
+    ],
+    'events': [],
+}
+
+
+def family_links(client) -> tuple[set, set]:
+    family = client.get('/api/current-family/export?format=json').get_json()
+    names = {person['id']: person['name'] for person in family['people']}
+    parents = {(names[rel['parent']], names[rel['child']]) for rel in family['relationships'] if 'parent' in rel}
+    return set(names.values()), parents
+
+
+def test_gedcom_round_trip_keeps_third_parents_and_at_signs(client, tmp_path):
+    client.post('/register', data={'username': 'exporter', 'password': 'pw', 'profile_name': 'Exporter'})
+    assert client.post('/api/current-family/import?replace=1', json=FAMILY).status_code == 200
+    before = family_links(client)
+    assert ('Carl Jones', 'Dora Smith') in before[1]
+
+    ged = client.get('/api/current-family/export?format=gedcom').get_data(as_text=True)
+    assert '1 NAME Ann @@Home /Smith/' in ged
+    assert '2 PLAC Flat 2 @@ Mill Lane' in ged
+
+    path = tmp_path / 'family.ged'
+    path.write_text(ged, encoding='utf-8')
+    other = app.test_client()
+    other.post('/register', data={'username': 'importer', 'password': 'pw', 'profile_name': 'Importer'})
+    result = app.test_cli_runner().invoke(args=['import-gedcom', str(path), '--user', 'importer', '--replace'])
+    assert result.exit_code == 0, result.output
+    assert family_links(other) == before
+
+
+def import_replacing(path, username: str):
+    return app.test_cli_runner().invoke(args=['import-gedcom', str(path), '--user', username, '--replace'])
+
+
+def test_failed_replace_keeps_the_old_tree(client, tmp_path, monkeypatch):
+    client.post('/register', data={'username': 'exporter', 'password': 'pw', 'profile_name': 'Exporter'})
+    client.post('/api/current-family/import?replace=1', json=FAMILY)
+    before = family_links(client)
+    path = tmp_path / 'family.ged'
+    path.write_text(client.get('/api/current-family/export?format=gedcom').get_data(as_text=True), encoding='utf-8')
+
+    def fail(family_pk):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(app_module, 'rebuild_family_ancestry', fail)
+    assert import_replacing(path, 'exporter').exit_code != 0
+    assert family_links(client) == before
+
+
+def test_replace_serves_the_new_tree(client, tmp_path):
+    client.post('/register', data={'username': 'exporter', 'password': 'pw', 'profile_name': 'Exporter'})
+    path = tmp_path / 'family.ged'
+    client.post('/api/current-family/import?replace=1', json=FAMILY)
+    path.write_text(client.get('/api/current-family/export?format=gedcom').get_data(as_text=True), encoding='utf-8')
+    client.post('/api/current-family/import?replace=1', json={**FAMILY, 'people': FAMILY['people'][:1], 'relationships': []})
+    etag = client.get('/api/current-family/people').headers['ETag']
+
+    assert import_replacing(path, 'exporter').exit_code == 0
+    response = client.get('/api/current-family/people', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert family_links(client)[0] == {'Ann @Home Smith', 'Bob Smith', 'Carl Jones', 'Dora Smith'}
@@ -0,0 +1,49 @@
+import logging
+
+from app import FamilyGraph, build_tree_layout
+
+
+def chain_family(size: int) -> dict:
+    return {
+        'meta': {'family_id': 'chain'},
+        'people': [{'id': f'p{i}', 'name': f'Person {i}', 'born': ''} for i in range(size)],
+        'relationships': [{'parent': f'p{i}', 'child': f'p{i + 1}'} for i in range(size - 1)],
+        'events': [],
+    }
+
+
+def cycle_family(family_id: str) -> dict:
+    people = [{'id': pid, 'name': pid.title(), 'born': born} for pid, born in (('ann', '1900'), ('ben', '1925'), ('cat', '1950'), ('dan', '1975'))]
+    links = [('ann', 'ben'), ('ben', 'cat'), ('cat', 'ann'), ('cat', 'dan')]
+    return {
+        'meta': {'family_id': family_id},
+        'people': people,
+        'relationships': [{'parent': parent, 'child': child} for parent, child in links],
+        'events': [],
+    }
+
+
+def test_generations_of_a_100k_chain():
+    graph = FamilyGraph(chain_family(100_000))
+    assert graph.generations[graph.index['p0']] == 0
+    assert graph.generations[graph.index['p99999']] == 99999
+    assert graph.cycle_ids == ()
+
+
+def test_parent_cycle_is_reported_and_still_laid_out():
+    data = cycle_family('cycle-layout')
+    graph = FamilyGraph(data)
+    # Everyone the loop holds up is reported, including dan below it.
+    assert set(graph.cycle_ids) == {'ann', 'ben', 'cat', 'dan'}
+    assert graph.generations[graph.index['dan']] == graph.generations[graph.index['cat']] + 1
+
+    layout = build_tree_layout(data)
+    assert sorted(card['id'] for card in layout['people']) == ['ann', 'ben', 'cat', 'dan']
+
+
+def test_parent_cycle_warning_is_logged_once(caplog):
+    data = cycle_family('cycle-warning')
+    with caplog.at_level(logging.WARNING):
+        FamilyGraph(data)
+        FamilyGraph(data)
+    assert [record.getMessage() for record in caplog.records].count('Parent cycle detected among 4 people: ann, ben, cat, dan') == 1
@@ -0,0 +1,72 @@
+import pytest
+
+import app as app_module
+
+
+FAMILY = {
+    'meta': {'family_name': 'Imported'},
+    'people': [
+        {'id': 'ann', 'name': 'Ann', 'born': '1950'},
+        {'id': 'bob', 'name': 'Bob', 'born': '1975'},
+    ],
+    'relationships': [{'parent': 'ann', 'child': 'bob'}],
+    'events': [],
+}
+
+
+def people_names(client) -> list[str]:
+    family = client.get('/api/current-family/export?format=json').get_json()
+    return sorted(person['name'] for person in family['people'])
+
+
+@pytest.fixture
+def member(client):
+    client.post('/register', data={'username': 'importer', 'password': 'pw', 'profile_name': 'Importer'})
+    return client
+
+
+@pytest.mark.parametrize('query', ['', '?replace=1'])
+def test_empty_people_list_is_rejected(member, query):
+    response = member.post(f'/api/current-family/import{query}', json={'people': []})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'invalid_family'
+    assert people_names(member) == ['Importer']
+
+
+@pytest.mark.parametrize('query', ['', '?replace=1'])
+def test_database_errors_come_back_as_json_and_roll_back(member, monkeypatch, query):
+    def fail(family_pk):
+        raise RuntimeError('ancestry rebuild failed')
+
+    monkeypatch.setattr(app_module, 'rebuild_family_ancestry', fail)
+    response = member.post(f'/api/current-family/import{query}', json=FAMILY)
+    assert response.status_code == 500
+    assert response.get_json() == {'ok': False, 'error': 'ancestry rebuild failed'}
+    assert people_names(member) == ['Importer']
+
+
+def test_replace_import(member):
+    response = member.post('/api/current-family/import?replace=1', json=FAMILY)
+    assert response.get_json() == {'ok': True, 'people': 2, 'places': 0, 'relationships': 1, 'skipped_events': 0}
+    assert people_names(member) == ['Ann', 'Bob']
+
+
+def test_invalid_coordinates_are_reported(member):
+    family = {
+        'people': [
+            {'id': 'ann', 'name': 'Ann', 'migrations': [{'label': 'Rome', 'lat': 'north', 'lng': 12.5}], 'current_location': {'label': 'Nowhere', 'lat': 10, 'lng': 500}},
+        ],
+        'relationships': [],
+    }
+    response = member.post('/api/current-family/import', json=family)
+    assert response.status_code == 400
+    assert response.get_json()['details'] == [
+        "person 'ann' migrations[0] has an invalid lat 'north'",
+        "person 'ann' current_location has an invalid lng 500",
+    ]
+
+
+def test_spouse_listed_both_ways_is_stored_once(member):
+    family = {**FAMILY, 'relationships': [*FAMILY['relationships'], {'type': 'spouse', 'a': 'ann', 'b': 'bob'}, {'type': 'spouse', 'a': 'bob', 'b': 'ann'}]}
+    response = member.post('/api/current-family/import?replace=1', json=family)
+    assert response.get_json()['relationships'] == 2
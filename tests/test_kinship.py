@@ -0,0 +1,78 @@
+import pytest
+
+from app import FamilyGraph, KinshipIndex, kinship_term
+
+#   gp3 = gp1 = gp2          sp
+#      |     |               |
+#      h   p1 = s1    p2 = s2
+#              |          |
+#             c1         c2
+#              |          |
+#            gc1        gc2
+PEOPLE = ['gp1', 'gp2', 'gp3', 'h', 'p1', 's1', 'p2', 's2', 'sp', 'c1', 'c2', 'gc1', 'gc2']
+PARENTS = [
+    ('gp1', 'p1'), ('gp2', 'p1'), ('gp1', 'p2'), ('gp2', 'p2'), ('gp1', 'h'), ('gp3', 'h'),
+    ('sp', 's1'), ('p1', 'c1'), ('s1', 'c1'), ('p2', 'c2'), ('s2', 'c2'), ('c1', 'gc1'), ('c2', 'gc2'),
+]
+SPOUSES = [('gp1', 'gp2'), ('gp1', 'gp3'), ('p1', 's1'), ('p2', 's2')]
+
+
+@pytest.fixture(scope='module')
+def kin() -> KinshipIndex:
+    data = {
+        'people': [{'id': pid, 'name': pid, 'born': str(1900 + position)} for position, pid in enumerate(PEOPLE)],
+        'relationships': [{'parent': parent, 'child': child} for parent, child in PARENTS]
+        + [{'type': 'spouse', 'a': a, 'b': b} for a, b in SPOUSES],
+    }
+    graph = FamilyGraph(data)
+    index = KinshipIndex(graph)
+    return lambda a, b: index.relate(graph.index[a], graph.index[b])
+
+
+@pytest.mark.parametrize('a, b, term', [
+    ('p1', 'p1', 'self'),
+    ('gp1', 'p1', 'parent'),
+    ('p1', 'gp1', 'child'),
+    ('gp1', 'c1', 'grandparent'),
+    ('gc1', 'gp2', 'great-grandchild'),
+    ('p1', 'p2', 'sibling'),
+    ('p1', 'h', 'half-sibling'),
+    ('h', 'c1', 'half-aunt/uncle'),
+    ('p2', 'c1', 'aunt/uncle'),
+    ('c1', 'p2', 'niece/nephew'),
+    ('p2', 'gc1', 'great-aunt/uncle'),
+    ('c1', 'c2', 'first cousin'),
+    ('gc1', 'c2', 'first cousin once removed'),
+    ('c2', 'gc1', 'first cousin once removed'),
+    ('gc1', 'gc2', 'second cousin'),
+    ('p1', 's1', 'spouse'),
+    ('sp', 'p1', 'parent-in-law'),
+    ('p1', 'sp', 'child-in-law'),
+    ('s2', 'p1', 'sibling-in-law'),
+    ('gp3', 'p1', 'stepparent'),
+    ('p1', 'gp3', 'stepchild'),
+    ('s1', 'c2', 'aunt/uncle by marriage'),
+])
+def test_terms(kin, a, b, term):
+    assert kin(a, b)['term'] == term
+
+
+def test_cousin_path_and_common_ancestors(kin):
+    found = kin('c1', 'c2')
+    assert found['generations'] == [2, 2]
+    assert found['common_ancestors'] == ['gp1', 'gp2']
+    assert found['path'] == ['c1', 'p1', 'gp1', 'p2', 'c2']
+
+
+def test_unrelated(kin):
+    assert kin('sp', 's2') == {'a': 'sp', 'b': 's2', 'related': False, 'term': None, 'path': []}
+
+
+@pytest.mark.parametrize('up, down, term', [
+    (3, 5, 'second cousin twice removed'),
+    (2, 6, 'first cousin 4 times removed'),
+    (12, 12, '11th cousin'),
+    (0, 4, 'great-great-grandparent'),
+])
+def test_kinship_term(up, down, term):
+    assert kinship_term(up, down) == term
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pytest
+from flask_migrate import check, downgrade, upgrade
+
+from app import db
+
+MIGRATIONS = str(Path(__file__).resolve().parent.parent / 'migrations')
+BASE = 'e4187d3299ec'
+
+
+@pytest.fixture
+def migrated(app):
+    db.drop_all()
+    yield
+    db.session.remove()
+    db.drop_all()
+    db.session.execute(db.text('DROP TABLE IF EXISTS alembic_version'))
+    db.session.commit()
+
+
+def test_migrations_match_the_models(migrated):
+    upgrade(directory=MIGRATIONS)
+    check(directory=MIGRATIONS)
+    downgrade(directory=MIGRATIONS, revision=BASE)
+    upgrade(directory=MIGRATIONS)
+
+
+def test_upgrade_backfills_the_ancestry_index(migrated):
+    upgrade(directory=MIGRATIONS, revision=BASE)
+    db.session.execute(db.text(
+        "INSERT INTO users VALUES (1, 'old', 'Old', 'x', '2020-01-01')"
+    ))
+    db.session.execute(db.text(
+        "INSERT INTO family_profiles VALUES (1, 1, 'old', 'Old', 'Old', 'p.png', '', '2020-01-01')"
+    ))
+    for pk in (1, 2, 3, 4):
+        db.session.execute(db.text(
+            "INSERT INTO people (id, family_id, public_id, name, born, died, photo, current_location_label, created_at)"
+            " VALUES (:pk, 1, :public_id, 'P', '', '', 'p.png', '', '2020-01-01')"
+        ), {'pk': pk, 'public_id': f'old {pk}'})
+    db.session.execute(db.text(
+        "INSERT INTO family_relationships (family_id, relationship_type, person_a_id, person_b_id)"
+        " VALUES (1, 'parent', 1, 2), (1, 'parent', 2, 3), (1, 'spouse', 3, 4)"
+    ))
+    db.session.commit()
+
+    upgrade(directory=MIGRATIONS)
+    pairs = set(db.session.execute(db.text('SELECT ancestor_id, descendant_id FROM person_ancestry')))
+    assert pairs == {(1, 2), (2, 3), (1, 3)}
+    assert db.session.scalar(db.text('SELECT revision FROM family_profiles')) == 0
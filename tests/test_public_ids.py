@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import FamilyProfile, Person, User, db, retry_on_conflict, unique_person_public_id
+
+
+@pytest.fixture
+def family(app):
+    user = User(username='ids', display_name='Ids', password_hash='x')
+    family = FamilyProfile(user=user, family_slug='ids', family_name='Ids', profile_name='Ids')
+    db.session.add_all([user, family, Person(family=family, public_id='ann', name='Ann')])
+    db.session.commit()
+    return family
+
+
+def test_public_id_conflict_is_retried(family):
+    calls = []
+
+    def insert():
+        # The first attempt races a worker that already took "ann".
+        public_id = 'ann' if not calls else unique_person_public_id('ann')
+        calls.append(public_id)
+        db.session.add(Person(family_id=family.id, public_id=public_id, name='Ann'))
+        db.session.commit()
+        return public_id
+
+    assert retry_on_conflict(insert) == 'ann_2'
+    assert calls == ['ann', 'ann_2']
+
+
+def test_other_integrity_errors_are_raised_at_once(family):
+    calls = []
+
+    def insert():
+        calls.append(1)
+        db.session.add(Person(family_id=family.id, public_id='bob', name=None))
+        db.session.commit()
+
+    with pytest.raises(IntegrityError, match='NOT NULL'):
+        retry_on_conflict(insert)
+    assert calls == [1]
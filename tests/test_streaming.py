@@ -0,0 +1,60 @@
+import hashlib
+import tracemalloc
+from datetime import datetime
+
+import app as app_module
+from app import FamilyProfile, FamilyRelationship, Person, PersonMigration, app, db
+
+SIZE = 10_000
+
+
+def grow_family(username: str, size: int) -> None:
+    with app.app_context():
+        family = db.session.scalar(db.select(FamilyProfile).join(FamilyProfile.user).where(app_module.User.username == username))
+        now = datetime.utcnow()
+        db.session.execute(Person.__table__.insert(), [
+            dict(family_id=family.id, public_id=f'p{i}', name=f'Person {i}', born=str(1800 + i % 200), died='', photo='',
+                 current_location_label='Boston', current_location_lat=42.36, current_location_lng=-71.06, created_at=now)
+            for i in range(size)
+        ])
+        ids = db.session.scalars(db.select(Person.id).where(Person.family_id == family.id).order_by(Person.id)).all()
+        db.session.execute(PersonMigration.__table__.insert(), [dict(person_id=pid, position=0, label='Rome', lat=41.9, lng=12.5) for pid in ids])
+        db.session.execute(FamilyRelationship.__table__.insert(), [
+            dict(family_id=family.id, relationship_type='parent', person_a_id=ids[(i - 1) // 2], person_b_id=ids[i])
+            for i in range(1, len(ids))
+        ])
+        db.session.commit()
+
+
+def fetch(client, url: str) -> tuple[str, int, str, int]:
+    """Digest, length, ETag and traced peak memory of a response, read chunk by chunk like a WSGI server would."""
+    app_module.payload_cache.clear()
+    digest = hashlib.sha256()
+    length = 0
+    tracemalloc.start()
+    try:
+        response = client.get(url, buffered=False)
+        for chunk in response.response:
+            digest.update(chunk)
+            length += len(chunk)
+        response.close()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return digest.hexdigest(), length, response.headers['ETag'], peak
+
+
+def test_streamed_tree_matches_buffered_with_lower_peak_memory(client, monkeypatch):
+    client.post('/register', data={'username': 'streamer', 'password': 'pw', 'profile_name': 'Streamer'})
+    grow_family('streamer', SIZE)
+
+    monkeypatch.setattr(app_module, 'STREAM_PEOPLE_THRESHOLD', SIZE * 10)
+    *buffered, buffered_peak = fetch(client, '/api/current-family/tree')
+    *streamed, streamed_peak = fetch(client, '/api/current-family/tree?stream=1')
+
+    assert streamed == buffered
+    assert buffered[1] > SIZE * 100
+    assert streamed_peak * 5 < buffered_peak
+
+    app_module.payload_cache.clear()
+    assert client.get('/api/current-family/tree?stream=1').get_data() == client.get('/api/current-family/tree').get_data()